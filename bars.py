@@ -0,0 +1,157 @@
+from array import array
+
+
+# ============================================================
+# OHLCV bars
+#
+# Price samples or trades are folded into bars for several
+# timeframes at once. Each timeframe keeps a fixed number of
+# bars in array-backed ring buffers, so memory stays bounded
+# and no timeframe is ever rebuilt from raw samples. A series
+# shrunk to save memory grows back to its full capacity as new
+# bars arrive.
+# ============================================================
+
+TIMEFRAMES = {
+    "1m": 60,
+    "15m": 15 * 60,
+    "1h": 60 * 60,
+    "1d": 24 * 60 * 60
+}
+
+# 1 day of minutes, 1 week of 15m bars, 30 days of hours, 1 year of days
+DEFAULT_CAPACITY = {
+    "1m": 1440,
+    "15m": 672,
+    "1h": 720,
+    "1d": 365
+}
+
+
+class BarSeries:
+
+    def __init__(self, seconds, capacity):
+        self.seconds = seconds
+        self.capacity = capacity
+        self.max_capacity = capacity
+        self.starts = array("q", bytes(8 * capacity))
+        self.opens = array("d", bytes(8 * capacity))
+        self.highs = array("d", bytes(8 * capacity))
+        self.lows = array("d", bytes(8 * capacity))
+        self.closes = array("d", bytes(8 * capacity))
+        self.volumes = array("d", bytes(8 * capacity))
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def update(self, timestamp, price, volume=0.0):
+        start = int(timestamp // self.seconds) * self.seconds
+
+        if self.count:
+            index = (self.count - 1) % self.capacity
+            current = self.starts[index]
+
+            if start < current:
+                # Late sample for a bar that is already closed.
+                return
+
+            if start == current:
+                if price > self.highs[index]:
+                    self.highs[index] = price
+                if price < self.lows[index]:
+                    self.lows[index] = price
+                self.closes[index] = price
+                self.volumes[index] += volume
+                return
+
+        if self.count >= self.capacity and self.capacity < self.max_capacity:
+            self._resize(min(self.capacity * 2, self.max_capacity))
+
+        index = self.count % self.capacity
+        self.starts[index] = start
+        self.opens[index] = price
+        self.highs[index] = price
+        self.lows[index] = price
+        self.closes[index] = price
+        self.volumes[index] = volume
+        self.count += 1
+
+    def shrink(self, capacity):
+        """
+        Keeps only the newest capacity bars.
+        """
+        if capacity >= self.capacity:
+            return
+
+        self._resize(capacity)
+
+    def _resize(self, capacity):
+        kept = self._indexes(capacity)
+        for name in ("starts", "opens", "highs", "lows", "closes", "volumes"):
+            old = getattr(self, name)
+            new = array(old.typecode, bytes(8 * capacity))
+            for position, index in enumerate(kept):
+                new[position] = old[index]
+            setattr(self, name, new)
+
+        self.capacity = capacity
+        self.count = len(kept)
+
+    def _indexes(self, count):
+        available = len(self)
+        if count is None or count > available:
+            count = available
+
+        first = self.count - count
+        return [i % self.capacity for i in range(first, self.count)]
+
+    def bars(self, count=None):
+        """
+        Returns up to count bars, oldest first. The last bar may
+        still be open.
+        """
+        return [
+            {
+                "start": self.starts[i],
+                "open": self.opens[i],
+                "high": self.highs[i],
+                "low": self.lows[i],
+                "close": self.closes[i],
+                "volume": self.volumes[i]
+            }
+            for i in self._indexes(count)
+        ]
+
+    def close_prices(self, count=None):
+        return [self.closes[i] for i in self._indexes(count)]
+
+    def latest(self):
+        if not self.count:
+            return None
+        return self.bars(1)[0]
+
+
+class BarResampler:
+
+    def __init__(self, timeframes=None, capacity=None):
+        timeframes = timeframes or TIMEFRAMES
+        capacity = capacity or DEFAULT_CAPACITY
+        self.series = {
+            name: BarSeries(seconds, capacity.get(name, 500))
+            for name, seconds in timeframes.items()
+        }
+
+    def update(self, timestamp, price, volume=0.0):
+        for series in self.series.values():
+            series.update(timestamp, price, volume)
+
+    def bars(self, timeframe, count=None):
+        if timeframe not in self.series:
+            raise ValueError("Unknown timeframe: {}".format(timeframe))
+        return self.series[timeframe].bars(count)
+
+    def close_prices(self, timeframe, count=None):
+        if timeframe not in self.series:
+            raise ValueError("Unknown timeframe: {}".format(timeframe))
+        return self.series[timeframe].close_prices(count)
@@ -0,0 +1,271 @@
+import json
+import os
+import struct
+import threading
+import zlib
+from array import array
+from pathlib import Path
+
+
+# ============================================================
+# Strategy checkpoints
+#
+# A full snapshot is written to <name> with write-to-temp and
+# rename. Between snapshots, small delta records are appended
+# to <name>.delta. Each record carries a sequence number and a
+# CRC so a torn write at the end of the delta file is ignored.
+#
+# Snapshot:  MAGIC | header | prices (float64) | signal (JSON)
+# Delta:     length | crc | header | new prices | signal (JSON)
+# ============================================================
+
+MAGIC = b"DTCK"
+VERSION = 1
+
+# version, sequence, sample total, last trade time,
+# pending signal, pending count, price count, signal length
+SNAPSHOT_HEADER = struct.Struct("<BQQdbIII")
+
+# sequence, sample total, last trade time,
+# pending signal, pending count, new price count, signal length
+DELTA_HEADER = struct.Struct("<QQdbIII")
+DELTA_FRAME = struct.Struct("<II")
+
+SIGNAL_CODES = {None: 0, "BUY": 1, "SELL": -1}
+SIGNAL_NAMES = {code: name for name, code in SIGNAL_CODES.items()}
+
+
+def _encode_signal(latest_signal):
+    return json.dumps(latest_signal, separators=(",", ":")).encode("utf-8")
+
+
+def _prices_bytes(prices):
+    return array("d", prices).tobytes()
+
+
+def _write_atomic(path, data):
+    temp_path = path.with_name(path.name + ".tmp")
+
+    with temp_path.open("wb") as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    os.replace(temp_path, path)
+
+
+def write_snapshot(path, state):
+    path = Path(path)
+    prices = _prices_bytes(state["prices"])
+    signal = _encode_signal(state["latest_signal"])
+
+    header = SNAPSHOT_HEADER.pack(
+        VERSION,
+        state["sequence"],
+        state["sample_total"],
+        state["last_trade_time"],
+        SIGNAL_CODES.get(state["pending_signal"], 0),
+        state["pending_signal_count"],
+        len(state["prices"]),
+        len(signal)
+    )
+
+    _write_atomic(path, MAGIC + header + prices + signal)
+
+    # Deltas older than the snapshot are no longer needed.
+    _write_atomic(path.with_name(path.name + ".delta"), b"")
+
+
+def append_delta(path, state, new_prices):
+    path = Path(path)
+    prices = _prices_bytes(new_prices)
+    signal = _encode_signal(state["latest_signal"])
+
+    body = DELTA_HEADER.pack(
+        state["sequence"],
+        state["sample_total"],
+        state["last_trade_time"],
+        SIGNAL_CODES.get(state["pending_signal"], 0),
+        state["pending_signal_count"],
+        len(new_prices),
+        len(signal)
+    ) + prices + signal
+
+    frame = DELTA_FRAME.pack(len(body), zlib.crc32(body))
+
+    with path.with_name(path.name + ".delta").open("ab") as handle:
+        handle.write(frame + body)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def _read_prices(data, offset, count):
+    prices = array("d")
+    prices.frombytes(data[offset:offset + count * 8])
+    return prices, offset + count * 8
+
+
+def load(path, max_prices):
+    """
+    Restores the newest state from a snapshot and its deltas.
+    Returns None when no usable snapshot exists.
+    """
+    path = Path(path)
+
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+
+    if not data.startswith(MAGIC):
+        return None
+
+    offset = len(MAGIC)
+    try:
+        (version, sequence, sample_total, last_trade_time, pending_code,
+         pending_count, price_count, signal_length) = \
+            SNAPSHOT_HEADER.unpack_from(data, offset)
+    except struct.error:
+        return None
+
+    if version != VERSION:
+        return None
+
+    offset += SNAPSHOT_HEADER.size
+    prices, offset = _read_prices(data, offset, price_count)
+
+    try:
+        latest_signal = json.loads(data[offset:offset + signal_length])
+    except ValueError:
+        return None
+
+    state = {
+        "sequence": sequence,
+        "sample_total": sample_total,
+        "last_trade_time": last_trade_time,
+        "pending_signal": SIGNAL_NAMES.get(pending_code),
+        "pending_signal_count": pending_count,
+        "prices": prices,
+        "latest_signal": latest_signal
+    }
+
+    try:
+        deltas = path.with_name(path.name + ".delta").read_bytes()
+    except OSError:
+        deltas = b""
+
+    offset = 0
+    while offset + DELTA_FRAME.size <= len(deltas):
+        length, crc = DELTA_FRAME.unpack_from(deltas, offset)
+        body = deltas[offset + DELTA_FRAME.size:offset + DELTA_FRAME.size + length]
+        if len(body) != length or zlib.crc32(body) != crc:
+            break
+
+        offset += DELTA_FRAME.size + length
+
+        (sequence, sample_total, last_trade_time, pending_code,
+         pending_count, price_count, signal_length) = \
+            DELTA_HEADER.unpack_from(body, 0)
+
+        if sequence <= state["sequence"]:
+            continue
+
+        new_prices, body_offset = _read_prices(body, DELTA_HEADER.size, price_count)
+        state["prices"].extend(new_prices)
+        state["sequence"] = sequence
+        state["sample_total"] = sample_total
+        state["last_trade_time"] = last_trade_time
+        state["pending_signal"] = SIGNAL_NAMES.get(pending_code)
+        state["pending_signal_count"] = pending_count
+        state["latest_signal"] = json.loads(
+            body[body_offset:body_offset + signal_length]
+        )
+
+    if len(state["prices"]) > max_prices:
+        del state["prices"][:-max_prices]
+
+    return state
+
+
+class CheckpointWriter(threading.Thread):
+    """
+    Writes checkpoints on a background thread.
+
+    submit() only stores the newest state and wakes the writer,
+    so the trading loop never waits on disk I/O. If the writer
+    falls behind, intermediate states are skipped.
+    """
+
+    def __init__(self, path, full_every=16, on_error=None):
+        super().__init__(daemon=True)
+        self.path = Path(path)
+        self.full_every = full_every
+        self.on_error = on_error
+        self._pending = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sequence = 0
+        self._written_total = None
+        self._deltas_since_full = 0
+
+    def resume(self, state):
+        self._sequence = state["sequence"]
+        self._written_total = state["sample_total"]
+
+        # The delta file may end in a frame torn by the crash, and
+        # load() stops reading there. Start over with a snapshot
+        # so new deltas are not appended behind it.
+        self._deltas_since_full = self.full_every
+
+    def submit(self, state):
+        with self._lock:
+            self._pending = state
+        self._wake.set()
+
+    def run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+
+            with self._lock:
+                state = self._pending
+                self._pending = None
+
+            if state is None:
+                continue
+
+            try:
+                self._write(state)
+            except OSError as exc:
+                if self.on_error:
+                    self.on_error(exc)
+
+    def _write(self, state):
+        self._sequence += 1
+        state = dict(state, sequence=self._sequence)
+
+        new_count = None
+        if self._written_total is not None:
+            new_count = state["sample_total"] - self._written_total
+
+        needs_full = (
+            new_count is None or
+            new_count > len(state["prices"]) or
+            self._deltas_since_full >= self.full_every
+        )
+
+        if needs_full:
+            write_snapshot(self.path, state)
+            self._deltas_since_full = 0
+        else:
+            new_prices = state["prices"][len(state["prices"]) - new_count:]
+            try:
+                append_delta(self.path, state, new_prices)
+            except OSError:
+                # A partial frame may be left behind; load() stops
+                # there, so the next write must be a snapshot.
+                self._deltas_since_full = self.full_every
+                raise
+            self._deltas_since_full += 1
+
+        self._written_total = state["sample_total"]
@@ -0,0 +1,412 @@
+import math
+from collections import deque
+
+
+# ============================================================
+# Streaming indicators
+#
+# Every indicator updates in O(1) per sample and returns None
+# until it has seen enough samples. The *_series functions give
+# the same values for a whole price series at once (NaN during
+# warm-up) and are meant for backtests. They need NumPy, which
+# is only imported when a series function is called.
+# ============================================================
+
+
+class SMA:
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+        self.value = None
+
+    def update(self, price):
+        self.window.append(price)
+        self.total += price
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+
+        if len(self.window) == self.period:
+            self.value = self.total / self.period
+        return self.value
+
+    def fields(self):
+        return {"": self.value}
+
+
+class EMA:
+    """
+    Exponential average seeded with the simple average of the
+    first period samples.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.count = 0
+        self.seed_total = 0.0
+        self.value = None
+
+    def update(self, price):
+        if self.value is not None:
+            self.value += self.alpha * (price - self.value)
+            return self.value
+
+        self.count += 1
+        self.seed_total += price
+        if self.count == self.period:
+            self.value = self.seed_total / self.period
+        return self.value
+
+    def fields(self):
+        return {"": self.value}
+
+
+class WilderAverage:
+    """
+    Wilder's smoothing, an EMA with alpha = 1 / period. Used by
+    RSI and ATR.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self.seed_total = 0.0
+        self.value = None
+
+    def update(self, sample):
+        if self.value is not None:
+            self.value += (sample - self.value) / self.period
+            return self.value
+
+        self.count += 1
+        self.seed_total += sample
+        if self.count == self.period:
+            self.value = self.seed_total / self.period
+        return self.value
+
+
+class RSI:
+
+    def __init__(self, period=14):
+        self.period = period
+        self.previous = None
+        self.gain = WilderAverage(period)
+        self.loss = WilderAverage(period)
+        self.value = None
+
+    def update(self, price):
+        if self.previous is None:
+            self.previous = price
+            return None
+
+        change = price - self.previous
+        self.previous = price
+
+        gain = self.gain.update(max(change, 0.0))
+        loss = self.loss.update(max(-change, 0.0))
+        if gain is None:
+            return None
+
+        if loss == 0:
+            self.value = 100.0
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + gain / loss)
+        return self.value
+
+    def fields(self):
+        return {"": self.value}
+
+
+class Bollinger:
+    """
+    Bollinger bands over a rolling window. Mean and variance are
+    kept with Welford's method, updated for the sample entering
+    and the sample leaving the window.
+    """
+
+    def __init__(self, period=20, width=2.0):
+        self.period = period
+        self.width = width
+        self.window = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.middle = None
+        self.upper = None
+        self.lower = None
+
+    def update(self, price):
+        self.window.append(price)
+
+        if len(self.window) <= self.period:
+            delta = price - self.mean
+            self.mean += delta / len(self.window)
+            self.m2 += delta * (price - self.mean)
+        else:
+            removed = self.window.popleft()
+            previous_mean = self.mean
+            self.mean += (price - removed) / self.period
+            self.m2 += (price - removed) * (
+                price - self.mean + removed - previous_mean
+            )
+
+        if len(self.window) < self.period:
+            return None
+
+        deviation = math.sqrt(max(self.m2, 0.0) / self.period)
+        self.middle = self.mean
+        self.upper = self.mean + self.width * deviation
+        self.lower = self.mean - self.width * deviation
+        return self.middle, self.upper, self.lower
+
+    def fields(self):
+        return {
+            "_middle": self.middle,
+            "_upper": self.upper,
+            "_lower": self.lower
+        }
+
+
+class ATR:
+    """
+    Average true range. Without high and low, the true range is
+    the absolute change between closes.
+    """
+
+    def __init__(self, period=14):
+        self.period = period
+        self.previous_close = None
+        self.average = WilderAverage(period)
+        self.value = None
+
+    def update(self, close, high=None, low=None):
+        high = close if high is None else high
+        low = close if low is None else low
+
+        if self.previous_close is None:
+            self.previous_close = close
+            return None
+
+        true_range = max(
+            high - low,
+            abs(high - self.previous_close),
+            abs(low - self.previous_close)
+        )
+        self.previous_close = close
+
+        self.value = self.average.update(true_range)
+        return self.value
+
+    def fields(self):
+        return {"": self.value}
+
+
+class MACD:
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+        self.value = None
+        self.signal_value = None
+        self.histogram = None
+
+    def update(self, price):
+        fast = self.fast.update(price)
+        slow = self.slow.update(price)
+        if fast is None or slow is None:
+            return None
+
+        self.value = fast - slow
+        self.signal_value = self.signal.update(self.value)
+        if self.signal_value is not None:
+            self.histogram = self.value - self.signal_value
+        return self.value, self.signal_value, self.histogram
+
+    def fields(self):
+        return {
+            "": self.value,
+            "_signal": self.signal_value,
+            "_hist": self.histogram
+        }
+
+
+INDICATOR_TYPES = {
+    "sma": SMA,
+    "ema": EMA,
+    "rsi": RSI,
+    "bollinger": Bollinger,
+    "atr": ATR,
+    "macd": MACD
+}
+
+
+class IndicatorSet:
+    """
+    Streaming indicators built from a declarative config:
+
+        {"rsi": ("rsi", {"period": 14}), ...}
+
+    values() flattens multi-value indicators into names such as
+    "bollinger_upper" or "macd_signal".
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.indicators = {}
+        for name, (kind, params) in config.items():
+            if kind not in INDICATOR_TYPES:
+                raise ValueError("Unknown indicator type: {}".format(kind))
+            self.indicators[name] = INDICATOR_TYPES[kind](**params)
+
+    def update(self, price):
+        for indicator in self.indicators.values():
+            indicator.update(price)
+
+    def values(self):
+        values = {}
+        for name, indicator in self.indicators.items():
+            for suffix, value in indicator.fields().items():
+                values[name + suffix] = value
+        return values
+
+    def rebuild(self, prices):
+        self.__init__(self.config)
+        for price in prices:
+            self.update(price)
+
+
+# ============================================================
+# Series versions for backtests
+# ============================================================
+
+def _numpy():
+    import numpy
+    return numpy
+
+
+def _smooth(np, samples, alpha, seed):
+    """
+    Vectorized y[i] = y[i-1] + alpha * (samples[i] - y[i-1]),
+    starting from seed. Works in blocks short enough that the
+    decay factors stay well inside float range.
+    """
+    output = np.empty(len(samples))
+    decay = 1.0 - alpha
+    if decay <= 0:
+        output[:] = samples
+        return output
+
+    block = max(1, int(12 * math.log(10) / -math.log(decay)))
+    previous = seed
+
+    for start in range(0, len(samples), block):
+        chunk = samples[start:start + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        smoothed = powers * (previous + alpha * np.cumsum(chunk / powers))
+        output[start:start + len(chunk)] = smoothed
+        previous = smoothed[-1]
+
+    return output
+
+
+def _seeded_smoothing(np, samples, period, alpha):
+    output = np.full(len(samples), np.nan)
+    if len(samples) < period:
+        return output
+
+    seed = samples[:period].mean()
+    output[period - 1] = seed
+    output[period:] = _smooth(np, samples[period:], alpha, seed)
+    return output
+
+
+def sma_series(prices, period):
+    np = _numpy()
+    prices = np.asarray(prices, dtype=float)
+    output = np.full(len(prices), np.nan)
+    if len(prices) < period:
+        return output
+
+    totals = np.cumsum(np.concatenate(([0.0], prices)))
+    output[period - 1:] = (totals[period:] - totals[:-period]) / period
+    return output
+
+
+def ema_series(prices, period):
+    np = _numpy()
+    prices = np.asarray(prices, dtype=float)
+    return _seeded_smoothing(np, prices, period, 2.0 / (period + 1))
+
+
+def rsi_series(prices, period=14):
+    np = _numpy()
+    prices = np.asarray(prices, dtype=float)
+    output = np.full(len(prices), np.nan)
+    if len(prices) < 2:
+        return output
+
+    changes = np.diff(prices)
+    gains = _seeded_smoothing(np, np.clip(changes, 0, None), period, 1.0 / period)
+    losses = _seeded_smoothing(np, np.clip(-changes, 0, None), period, 1.0 / period)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100.0 - 100.0 / (1.0 + gains / losses)
+    rsi[(losses == 0) & ~np.isnan(gains)] = 100.0
+
+    output[1:] = rsi
+    return output
+
+
+def bollinger_series(prices, period=20, width=2.0):
+    np = _numpy()
+    prices = np.asarray(prices, dtype=float)
+    middle = np.full(len(prices), np.nan)
+    upper = np.full(len(prices), np.nan)
+    lower = np.full(len(prices), np.nan)
+    if len(prices) < period:
+        return middle, upper, lower
+
+    windows = np.lib.stride_tricks.sliding_window_view(prices, period)
+    mean = windows.mean(axis=1)
+    deviation = windows.std(axis=1)
+
+    middle[period - 1:] = mean
+    upper[period - 1:] = mean + width * deviation
+    lower[period - 1:] = mean - width * deviation
+    return middle, upper, lower
+
+
+def atr_series(closes, period=14, highs=None, lows=None):
+    np = _numpy()
+    closes = np.asarray(closes, dtype=float)
+    highs = closes if highs is None else np.asarray(highs, dtype=float)
+    lows = closes if lows is None else np.asarray(lows, dtype=float)
+
+    output = np.full(len(closes), np.nan)
+    if len(closes) < 2:
+        return output
+
+    previous = closes[:-1]
+    true_range = np.maximum.reduce([
+        highs[1:] - lows[1:],
+        np.abs(highs[1:] - previous),
+        np.abs(lows[1:] - previous)
+    ])
+
+    output[1:] = _seeded_smoothing(np, true_range, period, 1.0 / period)
+    return output
+
+
+def macd_series(prices, fast=12, slow=26, signal=9):
+    np = _numpy()
+    prices = np.asarray(prices, dtype=float)
+    macd = ema_series(prices, fast) - ema_series(prices, slow)
+
+    signal_line = np.full(len(prices), np.nan)
+    start = slow - 1
+    if len(prices) > start:
+        signal_line[start:] = ema_series(macd[start:], signal)
+
+    return macd, signal_line, macd - signal_line
@@ -0,0 +1,218 @@
+import json
+import sqlite3
+import threading
+
+
+# ============================================================
+# Local ledger of account transactions
+#
+# Pages through Bitstamp's /user_transactions/ endpoint from a
+# persisted cursor, so each sync only fetches new entries, and
+# keeps them in an indexed SQLite table. Fees, PnL and cost
+# basis are then answered locally.
+#
+# Cost basis uses the average-cost method over BTC/USD trades;
+# BTC deposits and withdrawals are not priced.
+# ============================================================
+
+PAGE_SIZE = 1000
+
+TRANSACTION_TYPES = {
+    0: "deposit",
+    1: "withdrawal",
+    2: "trade",
+    14: "sub_account_transfer"
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    datetime TEXT NOT NULL,
+    type INTEGER NOT NULL,
+    usd REAL NOT NULL DEFAULT 0,
+    btc REAL NOT NULL DEFAULT 0,
+    price REAL,
+    fee REAL NOT NULL DEFAULT 0,
+    order_id INTEGER,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_datetime ON transactions (datetime);
+CREATE INDEX IF NOT EXISTS transactions_type ON transactions (type, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _float(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class Ledger:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def cursor(self):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM meta WHERE key = 'cursor'"
+            ).fetchone()
+        return int(row[0]) if row else 0
+
+    def sync(self, post):
+        """
+        Fetches transactions newer than the cursor. post is called
+        as post(endpoint, data) and returns a response or None.
+        Returns the number of new rows, or None if a request failed.
+        """
+        added = 0
+
+        while True:
+            cursor = self.cursor()
+            data = {"sort": "asc", "limit": PAGE_SIZE}
+            if cursor:
+                data["since_id"] = cursor
+
+            response = post("/user_transactions/", data)
+            if not response or response.status_code != 200:
+                return None
+
+            try:
+                page = response.json()
+            except ValueError:
+                return None
+
+            if not isinstance(page, list):
+                return None
+
+            rows = [self._row(entry) for entry in page]
+            rows = [row for row in rows if row and row[0] > cursor]
+            if not rows:
+                return added
+
+            newest = max(row[0] for row in rows)
+            with self.lock, self.connection:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO transactions "
+                    "(id, datetime, type, usd, btc, price, fee, order_id, raw) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('cursor', ?)",
+                    (str(newest),)
+                )
+
+            added += len(rows)
+            if len(page) < PAGE_SIZE:
+                return added
+
+    def _row(self, entry):
+        try:
+            transaction_id = int(entry["id"])
+            transaction_type = int(entry["type"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        price = _float(entry.get("btc_usd")) or None
+        order_id = entry.get("order_id")
+
+        return (
+            transaction_id,
+            str(entry.get("datetime", "")),
+            transaction_type,
+            _float(entry.get("usd")),
+            _float(entry.get("btc")),
+            price,
+            _float(entry.get("fee")),
+            int(order_id) if order_id else None,
+            json.dumps(entry, separators=(",", ":"))
+        )
+
+    def totals(self, since=None):
+        query = (
+            "SELECT type, COUNT(*), SUM(usd), SUM(btc), SUM(fee) "
+            "FROM transactions"
+        )
+        params = ()
+        if since:
+            query += " WHERE datetime >= ?"
+            params = (since,)
+        query += " GROUP BY type"
+
+        with self.lock:
+            rows = self.connection.execute(query, params).fetchall()
+
+        return {
+            TRANSACTION_TYPES.get(kind, str(kind)): {
+                "count": count,
+                "usd": usd,
+                "btc": btc,
+                "fee_usd": fee
+            }
+            for kind, count, usd, btc, fee in rows
+        }
+
+    def cost_basis(self, since=None):
+        """
+        Average-cost position from BTC/USD trades, with fees added
+        to the cost of buys and deducted from sale proceeds. The
+        position is always built from the full history; since only
+        limits which sales count toward realized PnL.
+        """
+        with self.lock:
+            trades = self.connection.execute(
+                "SELECT datetime, usd, btc, fee FROM transactions "
+                "WHERE type = 2 AND btc != 0 ORDER BY id"
+            ).fetchall()
+
+        held = 0.0
+        cost = 0.0
+        realized = 0.0
+        counted = 0
+        for datetime, usd, btc, fee in trades:
+            in_period = not since or datetime >= since
+            counted += in_period
+
+            if btc > 0:
+                held += btc
+                cost += abs(usd) + fee
+            else:
+                sold = min(-btc, held)
+                average = cost / held if held else 0.0
+                if in_period:
+                    realized += abs(usd) - fee - sold * average
+                cost -= sold * average
+                held -= sold
+
+        return {
+            "btc_held": held,
+            "cost_usd": cost,
+            "average_price": cost / held if held else None,
+            "realized_pnl_usd": realized,
+            "trades": counted
+        }
+
+    def summary(self, btc_price=None, since=None):
+        basis = self.cost_basis(since)
+        unrealized = None
+        if btc_price and basis["btc_held"]:
+            unrealized = basis["btc_held"] * btc_price - basis["cost_usd"]
+
+        totals = self.totals(since)
+        return {
+            "cursor": self.cursor(),
+            "totals": totals,
+            "fees_usd": sum(item["fee_usd"] or 0.0 for item in totals.values()),
+            "cost_basis": basis,
+            "unrealized_pnl_usd": unrealized
+        }
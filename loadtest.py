@@ -0,0 +1,78 @@
+"""
+Measures dashboard latency under concurrent clients.
+
+    python loadtest.py --url http://127.0.0.1:5000/api/dashboard --clients 100
+"""
+
+import argparse
+import threading
+import time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def client(url, requests_per_client, timeout, latencies, errors, lock):
+    for _ in range(requests_per_client):
+        started = time.perf_counter()
+        try:
+            with urlopen(url, timeout=timeout) as response:
+                response.read()
+        except (URLError, OSError):
+            with lock:
+                errors.append(1)
+            continue
+
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000/api/dashboard")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20,
+                        help="Requests per client")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(
+            target=client,
+            args=(args.url, args.requests, args.timeout, latencies, errors, lock)
+        )
+        for _ in range(args.clients)
+    ]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if not latencies:
+        print("No successful requests ({} errors)".format(len(errors)))
+        return
+
+    latencies.sort()
+    print("{} clients, {} requests, {} errors in {:.1f} s ({:.0f} req/s)".format(
+        args.clients, len(latencies), len(errors), elapsed,
+        len(latencies) / elapsed
+    ))
+    print("p50 {:.1f} ms | p99 {:.1f} ms | max {:.1f} ms".format(
+        percentile(latencies, 0.50) * 1000,
+        percentile(latencies, 0.99) * 1000,
+        latencies[-1] * 1000
+    ))
+
+
+if __name__ == "__main__":
+    main()
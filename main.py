@@ -4,11 +4,9 @@ import hmac
 import hashlib
 import json
 import os
-import numpy as np
 from dotenv import load_dotenv
 from flask import Flask, jsonify
 import threading
-from sklearn.ensemble import RandomForestRegressor
 from collections import deque
 
 # Load API keys from .env file
@@ -25,7 +23,7 @@ BASE_URL = "https://www.bitstamp.net/api/v2"
 app = Flask(__name__)
 latest_action = "No action yet"
 nonce_counter = int(time.time() * 1000)
-transaction_log = []
+transaction_log = deque(maxlen=150)
 TRADE_THRESHOLD = 0.001  # Adjusted to 0.1%
 LOOKBACK_PERIOD = 10  # Increased to 10 data points
 MIN_TRADE_AMOUNT = 5  # Minimum trade amount in USD
@@ -162,6 +160,11 @@ def update_price_history():
 
 
 def predict_trend():
+    # NumPy and scikit-learn take seconds to import on the Pi,
+    # so they are only loaded when a prediction is requested.
+    import numpy as np
+    from sklearn.ensemble import RandomForestRegressor
+
     trends = {}
     for currency in TRADE_CURRENCIES:
         print(f"Checking {currency}, history length: {len(price_history[currency])}")
@@ -234,18 +237,17 @@ def trading_bot():
         time.sleep(1200)  # Run every twenty minutes
 
 
-threading.Thread(target=trading_bot, daemon=True).start()
-threading.Thread(target=update_price_history, daemon=True).start()
-
 @app.route("/dashboard")
 def dashboard():
     balance = get_balance()
     return jsonify({
         "latest_action": latest_action,
         "balance": balance,
-        "transaction_log": transaction_log
+        "transaction_log": list(transaction_log)
     })
 
 
 if __name__ == "__main__":
+    threading.Thread(target=trading_bot, daemon=True).start()
+    threading.Thread(target=update_price_history, daemon=True).start()
     app.run(host="0.0.0.0", port=5000, debug=True)
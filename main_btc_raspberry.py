@@ -1,19 +1,85 @@
+import time
+
+# Taken before any other import, so the startup report includes
+# the cost of importing the bot's own modules.
+STARTUP_STARTED = time.perf_counter()
+
 import csv
+import gc
 import hashlib
 import hmac
+import operator
 import os
+import sys
 import threading
-import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from pathlib import Path
 
-import requests
 from dotenv import load_dotenv
-from flask import Flask, jsonify, Response
+
+import checkpoint
+import shadow
+import shared_state
+import strategy
+import tape
+from bars import BarResampler
+from indicators import IndicatorSet
+from ledger import Ledger
+from memory import MemoryMonitor
+from performance import PerformanceTracker
+from strategy import (
+    BUY_BUFFER,
+    BUY_TARGET_BTC_EXPOSURE,
+    CONFIRMATION_CYCLES,
+    FAST_WINDOW,
+    LONG_WINDOW,
+    MIN_TRADE_AMOUNT,
+    PRICE_UPDATE_SECONDS,
+    SELL_BUFFER,
+    SELL_TARGET_BTC_EXPOSURE,
+    SLOW_WINDOW,
+    TRADE_COOLDOWN_SECONDS
+)
+
+IMPORTS_FINISHED = time.perf_counter()
+
+
+# ============================================================
+# Startup timing
+#
+# requests and Flask are imported on first use. The trading
+# loop is started before the web server is created so the
+# first price sample is not delayed by the dashboard.
+#
+# Phases are marked from both the main and the trading thread,
+# so each is reported as an offset from process start.
+# ============================================================
+
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "3.0"))
+
+startup_phases = [("imports", IMPORTS_FINISHED - STARTUP_STARTED)]
+startup_reported = False
+
+
+def mark_startup_phase(name):
+    elapsed = time.perf_counter() - STARTUP_STARTED
+    startup_phases.append((name, elapsed))
+    return elapsed
 
 
 BASE_DIR = Path(__file__).resolve().parent
 HISTORY_FILE = BASE_DIR / "trading_history.csv"
+CHECKPOINT_FILE = BASE_DIR / "strategy_state.ckpt"
+LEDGER_FILE = BASE_DIR / "ledger.sqlite3"
+RECORD_TAPE = os.getenv("RECORD_TAPE")
+REPLAY_START_USD = 1000.0
 load_dotenv(BASE_DIR / "key.env")
+SHARED_STATE_FILE = Path(
+    os.getenv("SHARED_STATE_FILE") or shared_state.default_path(BASE_DIR)
+)
+mark_startup_phase("config")
 
 API_KEY = os.getenv("BITSTAMP_API_KEY")
 API_SECRET = os.getenv("BITSTAMP_API_SECRET")
@@ -26,9 +92,80 @@ if not API_SECRET:
 if not CUSTOMER_ID:
     raise ValueError("BITSTAMP_CUSTOMER_ID saknas i key.env")
 
-BASE_URL = "https://www.bitstamp.net/api/v2"
+# Can point at mock_exchange.py for load tests.
+BASE_URL = os.getenv("BITSTAMP_BASE_URL", "https://www.bitstamp.net/api/v2")
+
+app = None
+_requests = None
+
+# ============================================================
+# Dashboard serving
+#
+# Request handlers never wait on a slow exchange. They serve the
+# newest portfolio snapshot, taken by the trading loop or by an
+# earlier refresh. A stale snapshot starts one background
+# refresh, which the handler waits for at most
+# DASHBOARD_DEADLINE_SECONDS. ASYNC_DASHBOARD=0 restores the
+# old synchronous exchange calls. Web workers in shared mode
+# only show the snapshot the engine published.
+# ============================================================
+
+ASYNC_DASHBOARD = os.getenv("ASYNC_DASHBOARD", "1") == "1"
+DASHBOARD_CACHE_SECONDS = 30
+DASHBOARD_DEADLINE_SECONDS = 0.25
+
+portfolio_cache = {"snapshot": None, "updated": 0.0}
+portfolio_refresh = None
+refresh_executor = None
+refresh_lock = threading.Lock()
+
+# ============================================================
+# Memory budget
+#
+# With MEMORY_BUDGET_MB set, the bot drops old log entries and
+# bars and halves cached series when RSS goes above the budget.
+# RSS rarely falls after Python frees objects, so it trims again
+# only once RSS has grown past where the last trim left it.
+# TRACEMALLOC=<frames> enables allocation tracing for
+# /debug/memory.
+# ============================================================
+
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", "0"))
+MAX_LOG_ENTRIES = 150
+MIN_LOG_ENTRIES = 20
+MIN_BARS = 16
+MEMORY_GROWTH_BYTES = 1048576
+
+memory_trimmed_rss = 0
+
+memory_monitor = MemoryMonitor(trace_frames=int(os.getenv("TRACEMALLOC", "0")))
+
+# ============================================================
+# Per-cycle exchange data
+#
+# trade_logic fetches the balance and every ticker it needs once,
+# in parallel, at the start of the cycle. The rest of the cycle
+# reads from that instead of asking Bitstamp again.
+# ============================================================
+
+CYCLE_FETCH_WORKERS = 4
+
+cycle_executor = None
+
+
+class LogEntry:
+    __slots__ = ("timestamp", "message")
+
+    def __init__(self, timestamp, message):
+        self.timestamp = timestamp
+        self.message = message
+
+    def __str__(self):
+        return "{} - {}".format(
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.timestamp)),
+            self.message
+        )
 
-app = Flask(__name__)
 
 transaction_log = []
 latest_action = "No action yet"
@@ -39,52 +176,155 @@ latest_signal = {
     "timestamp": None
 }
 
+# The strategy settings themselves are in strategy.py.
+MAX_PRICE_HISTORY = LONG_WINDOW
+
 # ============================================================
-# Calmer strategy
+# Indicators
 #
-# One price sample every 15 minutes.
-#  8 samples  = 2-hour average
-# 32 samples  = 8-hour average
-# 96 samples  = 24-hour average
-#
-# A signal must be repeated three times before a trade.
-# At least six hours must pass between completed trades.
-# Instead of trading 75%, the bot moves toward target exposure.
+# The streaming indicators below are updated with every price
+# sample. TREND_LINES selects which values determine_signal
+# compares; the defaults are the simple averages above, so
+# e.g. "ema_fast"/"ema_slow" can be swapped in. Every condition
+# must hold for a BUY or SELL signal, written as
+# (value, operator, number or other value), e.g. ("rsi", "<", 70).
 # ============================================================
 
-PRICE_UPDATE_SECONDS = 900
+INDICATORS = {
+    "ema_fast": ("ema", {"period": FAST_WINDOW}),
+    "ema_slow": ("ema", {"period": SLOW_WINDOW}),
+    "rsi": ("rsi", {"period": 14}),
+    "bollinger": ("bollinger", {"period": 20, "width": 2.0}),
+    "atr": ("atr", {"period": 14}),
+    "macd": ("macd", {"fast": 12, "slow": 26, "signal": 9})
+}
 
-FAST_WINDOW = 8
-SLOW_WINDOW = 32
-LONG_WINDOW = 96
-MAX_PRICE_HISTORY = LONG_WINDOW
+TREND_LINES = {
+    "fast": "fast_ma",
+    "slow": "slow_ma",
+    "long": "long_ma"
+}
 
-BUY_BUFFER = 0.005          # Fast average must be 0.5% above slow average
-SELL_BUFFER = 0.007         # Fast average must be 0.7% below slow average
-CONFIRMATION_CYCLES = 3     # Signal must remain for 45 minutes
-TRADE_COOLDOWN_SECONDS = 6 * 60 * 60
+BUY_CONDITIONS = []
+SELL_CONDITIONS = []
 
-BUY_TARGET_BTC_EXPOSURE = 0.65
-SELL_TARGET_BTC_EXPOSURE = 0.20
-MIN_TRADE_AMOUNT = 10.0
+CONDITION_OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge
+}
+
+# ============================================================
+# Shadow strategies
+#
+# Paper-trading variants of the strategy, stepped on every live
+# price sample without placing orders. One variant is created
+# per combination in SHADOW_GRID; the other parameters are the
+# live settings. Needs NumPy; disable with SHADOW_STRATEGIES=0.
+# ============================================================
 
-price_history = {"btc": []}
+SHADOW_STRATEGIES = os.getenv("SHADOW_STRATEGIES", "1") == "1"
+SHADOW_FEE_RATE = strategy.FEE_RATE
+
+SHADOW_GRID = {
+    "fast_window": [6, 8, 12],
+    "buy_buffer": [0.003, 0.005, 0.0075],
+    "sell_buffer": [0.005, 0.007, 0.01],
+    "confirmation_cycles": [2, 3]
+}
+
+# A full checkpoint is written every 16 cycles (4 hours),
+# with small deltas in between.
+CHECKPOINT_FULL_EVERY = 16
+
+# Bars per timeframe included in the shared engine state.
+BAR_PUBLISH_COUNT = 96
+
+# The ledger is synced after every order, and otherwise every
+# 6 hours to pick up deposits, withdrawals and manual trades.
+LEDGER_SYNC_SECONDS = 6 * 60 * 60
+
+price_history = {"btc": array("d")}
+indicator_set = IndicatorSet(INDICATORS)
+bar_resampler = BarResampler()
+performance_tracker = PerformanceTracker(HISTORY_FILE, PRICE_UPDATE_SECONDS)
+shadow_book = None
+ledger = None
+ledger_stale = True
+ledger_synced_at = 0.0
+
+# Set while recording to, or replaying from, a market data tape.
+tape_recorder = None
+replayer = None
+price_sample_total = 0
 last_trade_time = 0.0
 pending_signal = None
 pending_signal_count = 0
 
 state_lock = threading.Lock()
+checkpoint_writer = None
+
+# Set in engine mode (writer) and in web workers (reader).
+shared_writer = None
+shared_reader = None
 
 
 def log(message):
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-    entry = "{} - {}".format(timestamp, message)
+    entry = LogEntry(now(), message)
     print(entry)
 
     with state_lock:
         transaction_log.append(entry)
-        if len(transaction_log) > 150:
-            del transaction_log[:-150]
+        if len(transaction_log) > MAX_LOG_ENTRIES:
+            del transaction_log[:-MAX_LOG_ENTRIES]
+
+
+def now():
+    """
+    Current time, or the simulated clock while replaying a tape.
+    """
+    if replayer is not None:
+        return replayer.clock
+    return time.time()
+
+
+def http():
+    """
+    Returns the requests module, importing it on first use.
+    """
+    global _requests
+
+    if _requests is None:
+        import requests
+        _requests = requests
+
+    return _requests
+
+
+def log_startup_report():
+    global startup_reported
+
+    if startup_reported:
+        return
+
+    startup_reported = True
+    parts = [
+        "{} at {:.0f} ms".format(name, elapsed * 1000)
+        for name, elapsed in sorted(startup_phases, key=lambda phase: phase[1])
+    ]
+
+    log("Startup: {}".format(" | ".join(parts)))
+
+    # The first trade cycle waits on Bitstamp, so only the phases
+    # before it count toward the budget.
+    local = max(
+        elapsed for name, elapsed in startup_phases
+        if name != "first trade cycle"
+    )
+    if local > STARTUP_BUDGET_SECONDS:
+        log("Startup took {:.1f} s before the first trade cycle, over the "
+            "budget of {:.1f} s".format(local, STARTUP_BUDGET_SECONDS))
 
 
 def create_signature():
@@ -99,6 +339,9 @@ def create_signature():
 
 
 def bitstamp_post(endpoint, data=None):
+    if replayer is not None:
+        return replayer.post(endpoint, data)
+
     signature, nonce = create_signature()
 
     payload = {
@@ -110,6 +353,7 @@ def bitstamp_post(endpoint, data=None):
     if data:
         payload.update(data)
 
+    requests = http()
     try:
         return requests.post(
             BASE_URL + endpoint,
@@ -122,20 +366,32 @@ def bitstamp_post(endpoint, data=None):
 
 
 def bitstamp_get(endpoint):
+    if replayer is not None:
+        return replayer.get(endpoint)
+
+    requests = http()
     try:
-        return requests.get(BASE_URL + endpoint, timeout=15)
+        response = requests.get(BASE_URL + endpoint, timeout=15)
     except requests.RequestException as exc:
         log("Bitstamp GET error {}: {}".format(endpoint, exc))
         return None
 
+    if tape_recorder is not None and response.status_code == 200:
+        try:
+            tape_recorder.record(time.time(), endpoint, response.content)
+        except OSError as exc:
+            log("Could not record {}: {}".format(endpoint, exc))
+
+    return response
+
 
-def get_price(pair, store_history=False):
+def get_price(pair):
     """
     Fetches a current price.
 
-    Only the trading loop calls this with store_history=True.
-    Dashboard requests and order validation no longer distort
-    the evenly spaced price history.
+    The price history is only extended by record_price_sample,
+    so dashboard requests and order validation do not distort
+    the evenly spaced samples.
     """
     response = bitstamp_get("/ticker/{}/".format(pair))
     if not response or response.status_code != 200:
@@ -148,15 +404,30 @@ def get_price(pair, store_history=False):
         log("Invalid price response for {}".format(pair))
         return None
 
-    if pair == "btcusd" and store_history:
+    # Bars are time based, so every BTC price is used for them.
+    if pair == "btcusd":
         with state_lock:
-            price_history["btc"].append(price)
-            if len(price_history["btc"]) > MAX_PRICE_HISTORY:
-                price_history["btc"].pop(0)
+            bar_resampler.update(now(), price)
 
     return price
 
 
+def record_price_sample(price):
+    global price_sample_total
+
+    with state_lock:
+        price_sample_total += 1
+        price_history["btc"].append(price)
+        indicator_set.update(price)
+        if len(price_history["btc"]) > MAX_PRICE_HISTORY:
+            price_history["btc"].pop(0)
+
+
+def get_bars(timeframe, count=None):
+    with state_lock:
+        return bar_resampler.bars(timeframe, count)
+
+
 def get_balance():
     response = bitstamp_post("/balance/")
     if not response or response.status_code != 200:
@@ -192,13 +463,14 @@ def get_balance():
     }
 
 
-def get_portfolio_snapshot(btc_price=None):
-    balance = get_balance()
+def get_portfolio_snapshot(btc_price=None, balance=None):
+    if balance is None:
+        balance = get_balance()
     if not balance:
         return None
 
     if btc_price is None:
-        btc_price = get_price("btcusd", store_history=False)
+        btc_price = get_price("btcusd")
 
     if not btc_price:
         return None
@@ -233,23 +505,46 @@ def simple_average(values, window):
 def calculate_indicators():
     with state_lock:
         prices = list(price_history["btc"])
+        streaming = indicator_set.values()
 
     fast_ma = simple_average(prices, FAST_WINDOW)
     slow_ma = simple_average(prices, SLOW_WINDOW)
     long_ma = simple_average(prices, LONG_WINDOW)
 
-    return {
+    values = {
         "sample_count": len(prices),
         "fast_ma": fast_ma,
         "slow_ma": slow_ma,
         "long_ma": long_ma
     }
+    values.update(streaming)
+    return values
+
+
+def failed_condition(indicators, conditions):
+    """
+    Returns a reason for the first condition that does not hold,
+    or None when all of them hold.
+    """
+    for name, comparison, limit in conditions:
+        value = indicators.get(name)
+        target = indicators.get(limit) if isinstance(limit, str) else limit
+
+        if value is None or target is None:
+            return "väntar på {}".format(
+                name if value is None else limit
+            )
+
+        if not CONDITION_OPERATORS[comparison](value, target):
+            return "{} {} {} uppfylls inte".format(name, comparison, limit)
+
+    return None
 
 
 def determine_signal(indicators):
-    fast_ma = indicators["fast_ma"]
-    slow_ma = indicators["slow_ma"]
-    long_ma = indicators["long_ma"]
+    fast_ma = indicators[TREND_LINES["fast"]]
+    slow_ma = indicators[TREND_LINES["slow"]]
+    long_ma = indicators[TREND_LINES["long"]]
 
     if fast_ma is None or slow_ma is None:
         return "HOLD", "Väntar på minst {} jämna prisprover".format(SLOW_WINDOW)
@@ -263,12 +558,20 @@ def determine_signal(indicators):
     long_sell_ok = long_ma is None or slow_ma <= long_ma
 
     if fast_ma > buy_level and long_buy_ok:
+        blocked = failed_condition(indicators, BUY_CONDITIONS)
+        if blocked:
+            return "HOLD", "Köpsignal stoppad: {}".format(blocked)
+
         return (
             "BUY",
             "2h-snittet ligger tydligt över 8h-snittet"
         )
 
     if fast_ma < sell_level and long_sell_ok:
+        blocked = failed_condition(indicators, SELL_CONDITIONS)
+        if blocked:
+            return "HOLD", "Säljsignal stoppad: {}".format(blocked)
+
         return (
             "SELL",
             "2h-snittet ligger tydligt under 8h-snittet"
@@ -330,7 +633,7 @@ def append_history(snapshot, indicators, raw_signal,
     with HISTORY_FILE.open("a", newline="") as csv_file:
         writer = csv.writer(csv_file)
         writer.writerow([
-            time.strftime("%Y-%m-%d %H:%M:%S"),
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now())),
             "{:.2f}".format(snapshot["btc_price"]),
             "{:.2f}".format(snapshot["portfolio_value_usd"]),
             "{:.2f}".format(snapshot["usd_balance"]),
@@ -346,8 +649,11 @@ def append_history(snapshot, indicators, raw_signal,
         ])
 
 
-def buy_currency(currency, usd_amount):
-    price = get_price("{}usd".format(currency), store_history=False)
+def buy_currency(currency, usd_amount, price=None):
+    global ledger_stale
+
+    if price is None:
+        price = get_price("{}usd".format(currency))
     if not price:
         return False
 
@@ -369,6 +675,7 @@ def buy_currency(currency, usd_amount):
     )
 
     if response and response.status_code == 200:
+        ledger_stale = True
         log("Bought {:.8f} {} for {:.2f} USD".format(
             crypto_amount, currency, usd_amount
         ))
@@ -381,8 +688,11 @@ def buy_currency(currency, usd_amount):
     return False
 
 
-def sell_currency(currency, amount):
-    price = get_price("{}usd".format(currency), store_history=False)
+def sell_currency(currency, amount, price=None):
+    global ledger_stale
+
+    if price is None:
+        price = get_price("{}usd".format(currency))
     if not price:
         return False
 
@@ -403,6 +713,7 @@ def sell_currency(currency, amount):
     )
 
     if response and response.status_code == 200:
+        ledger_stale = True
         log("Sold {:.8f} {} for approximately {:.2f} USD".format(
             amount, currency, usd_value
         ))
@@ -415,20 +726,56 @@ def sell_currency(currency, amount):
     return False
 
 
-def sell_all_non_btc_to_usd():
-    balance = get_balance()
+def fetch_cycle_data():
+    """
+    Fetches the balance and the BTC price at the same time, then
+    the prices of any other held currencies at the same time.
+    Failed fetches are left as None.
+    """
+    global cycle_executor
+
+    if cycle_executor is None:
+        cycle_executor = ThreadPoolExecutor(max_workers=CYCLE_FETCH_WORKERS)
+
+    balance_future = cycle_executor.submit(get_balance)
+    prices = {"btc": get_price("btcusd")}
+    balance = balance_future.result()
+
+    if balance:
+        others = [
+            currency for currency in balance["crypto"]
+            if currency not in ("btc", "usd")
+        ]
+        pairs = ["{}usd".format(currency) for currency in others]
+        prices.update(zip(others, cycle_executor.map(get_price, pairs)))
+
+    return {
+        "balance": balance,
+        "prices": prices
+    }
+
+
+def sell_all_non_btc_to_usd(cycle):
+    """
+    Returns True if anything was sold, so the caller knows the
+    cycle's balance is out of date.
+    """
+    balance = cycle["balance"]
     if not balance:
-        return
+        return False
 
+    sold = False
     for currency, amount in balance["crypto"].items():
         if currency in ("btc", "usd"):
             continue
 
-        price = get_price("{}usd".format(currency), store_history=False)
+        price = cycle["prices"].get(currency)
 
         if price and amount * price >= MIN_TRADE_AMOUNT:
             log("Converting {} to USD before BTC strategy".format(currency))
-            sell_currency(currency, amount)
+            sold = sell_currency(currency, amount, price) or sold
+
+    return sold
 
 
 def trade_toward_target(snapshot, signal):
@@ -448,7 +795,7 @@ def trade_toward_target(snapshot, signal):
             return False, "BTC-andelen ligger redan nära köp-målet"
 
         usd_to_buy = min(usd_to_buy, snapshot["usd_balance"])
-        success = buy_currency("btc", usd_to_buy)
+        success = buy_currency("btc", usd_to_buy, btc_price)
         return success, "Flyttar portföljen mot {:.0%} BTC".format(
             BUY_TARGET_BTC_EXPOSURE
         )
@@ -462,7 +809,7 @@ def trade_toward_target(snapshot, signal):
 
         btc_to_sell = usd_to_sell / btc_price
         btc_to_sell = min(btc_to_sell, snapshot["btc_balance"])
-        success = sell_currency("btc", btc_to_sell)
+        success = sell_currency("btc", btc_to_sell, btc_price)
         return success, "Flyttar portföljen mot {:.0%} BTC".format(
             SELL_TARGET_BTC_EXPOSURE
         )
@@ -470,6 +817,44 @@ def trade_toward_target(snapshot, signal):
     return False, "Ingen handel för HOLD-signal"
 
 
+def update_shadows(snapshot):
+    global shadow_book
+    global SHADOW_STRATEGIES
+
+    if not SHADOW_STRATEGIES:
+        return
+
+    if shadow_book is None:
+        if TREND_LINES != shadow.TREND_LINES or BUY_CONDITIONS or SELL_CONDITIONS:
+            SHADOW_STRATEGIES = False
+            log("Shadow strategies disabled: they only model the default "
+                "moving averages without extra conditions")
+            return
+
+        try:
+            shadow_book = shadow.ShadowBook(SHADOW_GRID, fee_rate=SHADOW_FEE_RATE)
+        except ImportError:
+            SHADOW_STRATEGIES = False
+            log("Shadow strategies disabled: NumPy is not installed")
+            return
+
+        log("Started {} shadow strategies".format(len(shadow_book.variants)))
+
+    with state_lock:
+        shadow_book.update(
+            price_history["btc"],
+            snapshot["usd_balance"],
+            snapshot["btc_balance"],
+            now()
+        )
+
+
+def shadow_summary():
+    if shadow_book is None:
+        return []
+    return shadow_book.summary(sorted(SHADOW_GRID))
+
+
 def trade_logic():
     global latest_action
     global latest_reason
@@ -478,22 +863,36 @@ def trade_logic():
     global pending_signal
     global pending_signal_count
 
-    sell_all_non_btc_to_usd()
+    cycle = fetch_cycle_data()
 
-    # This is the only regularly scheduled history sample.
-    btc_price = get_price("btcusd", store_history=True)
+    balance = cycle["balance"]
+    if sell_all_non_btc_to_usd(cycle):
+        balance = None
+
+    btc_price = cycle["prices"]["btc"]
     if not btc_price:
         latest_action = "ERROR"
         latest_reason = "Kunde inte hämta BTC-priset"
         return
 
-    snapshot = get_portfolio_snapshot(btc_price)
+    # This is the only regularly scheduled history sample.
+    record_price_sample(btc_price)
+
+    snapshot = get_portfolio_snapshot(btc_price, balance)
     if not snapshot:
         latest_action = "ERROR"
         latest_reason = "Kunde inte läsa portföljen"
         return
 
+    remember_portfolio(snapshot)
+
     indicators = calculate_indicators()
+
+    try:
+        update_shadows(snapshot)
+    except Exception as exc:
+        log("Shadow strategy update failed: {}".format(exc))
+
     raw_signal, signal_reason = determine_signal(indicators)
     confirmation_count = update_confirmation(raw_signal)
 
@@ -501,7 +900,7 @@ def trade_logic():
     reason = signal_reason
 
     cooldown_remaining = (
-        TRADE_COOLDOWN_SECONDS - (time.time() - last_trade_time)
+        TRADE_COOLDOWN_SECONDS - (now() - last_trade_time)
     )
 
     enough_confirmation = (
@@ -527,7 +926,7 @@ def trade_logic():
 
         if success:
             decision = raw_signal
-            last_trade_time = time.time()
+            last_trade_time = now()
             pending_signal = None
             pending_signal_count = 0
         else:
@@ -549,7 +948,10 @@ def trade_logic():
         "slow_ma": indicators["slow_ma"],
         "long_ma": indicators["long_ma"],
         "sample_count": indicators["sample_count"],
-        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+        "indicators": {
+            name: indicators[name] for name in indicator_set.values()
+        },
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now()))
     }
 
     append_history(
@@ -573,9 +975,203 @@ def trade_logic():
     )
 
 
+def checkpoint_state():
+    with state_lock:
+        return {
+            "sample_total": price_sample_total,
+            "prices": list(price_history["btc"]),
+            "last_trade_time": last_trade_time,
+            "pending_signal": pending_signal,
+            "pending_signal_count": pending_signal_count,
+            "latest_signal": dict(latest_signal)
+        }
+
+
+def restore_checkpoint():
+    """
+    Restores cooldown, confirmation progress and price history
+    after a crash or reboot.
+    """
+    global price_sample_total
+    global last_trade_time
+    global pending_signal
+    global pending_signal_count
+    global latest_signal
+    global latest_action
+    global latest_reason
+
+    state = checkpoint.load(CHECKPOINT_FILE, MAX_PRICE_HISTORY)
+    if state is None:
+        return None
+
+    with state_lock:
+        price_history["btc"] = array("d", state["prices"])
+        indicator_set.rebuild(price_history["btc"])
+        price_sample_total = state["sample_total"]
+        last_trade_time = state["last_trade_time"]
+        pending_signal = state["pending_signal"]
+        pending_signal_count = state["pending_signal_count"]
+        latest_signal = state["latest_signal"]
+
+    latest_action = latest_signal.get("action", latest_action)
+    latest_reason = latest_signal.get("reason", latest_reason)
+
+    log("Restored checkpoint: {} samples, pending {} {}/{}".format(
+        len(state["prices"]),
+        pending_signal or "-",
+        pending_signal_count,
+        CONFIRMATION_CYCLES
+    ))
+    return state
+
+
+def start_checkpoint_writer(state):
+    global checkpoint_writer
+
+    checkpoint_writer = checkpoint.CheckpointWriter(
+        CHECKPOINT_FILE,
+        full_every=CHECKPOINT_FULL_EVERY,
+        on_error=lambda exc: log("Checkpoint write failed: {}".format(exc))
+    )
+    if state is not None:
+        checkpoint_writer.resume(state)
+    checkpoint_writer.start()
+
+
+def engine_state():
+    with state_lock:
+        return {
+            "latest_action": latest_action,
+            "latest_reason": latest_reason,
+            "latest_signal": dict(latest_signal),
+            "transaction_log": [str(entry) for entry in transaction_log],
+            "btc_price_history_count": len(price_history["btc"]),
+            "memory": memory_monitor.history(),
+            "portfolio": portfolio_cache["snapshot"],
+            "portfolio_updated": portfolio_cache["updated"],
+            "shadows": shadow_summary(),
+            "bars": {
+                name: bar_resampler.bars(name, BAR_PUBLISH_COUNT)
+                for name in bar_resampler.series
+            },
+            "startup": [
+                {"phase": name, "elapsed_ms": round(elapsed * 1000, 1)}
+                for name, elapsed in startup_phases
+            ]
+        }
+
+
+def publish_state():
+    if shared_writer is None:
+        return
+
+    try:
+        shared_writer.publish(engine_state())
+    except ValueError as exc:
+        log("Could not publish shared state: {}".format(exc))
+
+
+def current_state():
+    """
+    State shown by the dashboard. Web workers read the engine's
+    shared memory region; the single-process mode reads globals.
+    """
+    if shared_reader is not None:
+        state = shared_reader.read()
+        if state is not None:
+            return state
+
+        return {
+            "latest_action": "No action yet",
+            "latest_reason": "Väntar på att trading-motorn publicerar sitt läge",
+            "latest_signal": {},
+            "transaction_log": [],
+            "btc_price_history_count": 0,
+            "memory": [],
+            "portfolio": None,
+            "portfolio_updated": 0.0,
+            "shadows": [],
+            "bars": {},
+            "startup": []
+        }
+
+    return engine_state()
+
+
+def enforce_memory_budget():
+    global memory_trimmed_rss
+
+    rss = memory_monitor.sample()
+    if not MEMORY_BUDGET_MB or rss <= MEMORY_BUDGET_MB * 1048576:
+        return
+
+    if rss <= memory_trimmed_rss + MEMORY_GROWTH_BYTES:
+        return
+
+    with state_lock:
+        del transaction_log[:-MIN_LOG_ENTRIES]
+        for series in bar_resampler.series.values():
+            series.shrink(max(len(series) // 2, MIN_BARS))
+
+    performance_tracker.shrink()
+    gc.collect()
+    memory_trimmed_rss = memory_monitor.sample()
+
+    log("RSS {:.1f} MB over budget {:.1f} MB: trimmed log, bars and "
+        "performance series, now {:.1f} MB".format(
+            rss / 1048576.0,
+            MEMORY_BUDGET_MB,
+            memory_trimmed_rss / 1048576.0
+        ))
+
+
+def get_ledger():
+    global ledger
+
+    with state_lock:
+        if ledger is None:
+            ledger = Ledger(LEDGER_FILE)
+        return ledger
+
+
+def ledger_sync_due():
+    return ledger_stale or now() - ledger_synced_at >= LEDGER_SYNC_SECONDS
+
+
+def sync_ledger():
+    """
+    Fetches only transactions newer than the stored cursor.
+    """
+    global ledger_stale
+    global ledger_synced_at
+
+    added = get_ledger().sync(bitstamp_post)
+    if added is None:
+        log("Could not sync ledger")
+        return None
+
+    ledger_stale = False
+    ledger_synced_at = now()
+    if added:
+        log("Ledger: {} new transactions".format(added))
+    return added
+
+
+def start_tape_recorder():
+    global tape_recorder
+
+    if RECORD_TAPE and tape_recorder is None:
+        tape_recorder = tape.TapeRecorder(RECORD_TAPE)
+        log("Recording market data to {}".format(RECORD_TAPE))
+
+
 def trading_bot():
     log("Trading bot started")
+    start_tape_recorder()
     ensure_history_file()
+    start_checkpoint_writer(restore_checkpoint())
+    publish_state()
+    mark_startup_phase("state restored")
 
     while True:
         try:
@@ -583,18 +1179,86 @@ def trading_bot():
         except Exception as exc:
             log("Unexpected error in trading_bot: {}".format(exc))
 
+        try:
+            if ledger_sync_due():
+                sync_ledger()
+        except Exception as exc:
+            log("Unexpected error in sync_ledger: {}".format(exc))
+
+        checkpoint_writer.submit(checkpoint_state())
+        enforce_memory_budget()
+        publish_state()
+
+        if not startup_reported:
+            mark_startup_phase("first trade cycle")
+            log_startup_report()
+
         time.sleep(PRICE_UPDATE_SECONDS)
 
 
-@app.route("/dashboard")
+def remember_portfolio(snapshot):
+    if snapshot:
+        with state_lock:
+            portfolio_cache["snapshot"] = snapshot
+            portfolio_cache["updated"] = time.time()
+    return snapshot
+
+
+def refresh_portfolio():
+    return remember_portfolio(get_portfolio_snapshot())
+
+
+def dashboard_portfolio(state):
+    """
+    Portfolio snapshot for a dashboard request. Waits on the
+    exchange for at most DASHBOARD_DEADLINE_SECONDS.
+
+    Web workers never call the exchange themselves. They show the
+    snapshot the engine published, so the engine is the only
+    process that signs requests and nonces cannot collide.
+    """
+    global portfolio_refresh
+    global refresh_executor
+
+    if shared_reader is not None:
+        return state["portfolio"]
+
+    if not ASYNC_DASHBOARD:
+        return get_portfolio_snapshot()
+
+    with state_lock:
+        snapshot = portfolio_cache["snapshot"]
+        age = time.time() - portfolio_cache["updated"]
+
+    if snapshot is not None and age < DASHBOARD_CACHE_SECONDS:
+        return snapshot
+
+    with refresh_lock:
+        if portfolio_refresh is None or portfolio_refresh.done():
+            if refresh_executor is None:
+                refresh_executor = ThreadPoolExecutor(max_workers=1)
+            portfolio_refresh = refresh_executor.submit(refresh_portfolio)
+        pending = portfolio_refresh
+
+    try:
+        return pending.result(timeout=DASHBOARD_DEADLINE_SECONDS) or snapshot
+    except FutureTimeoutError:
+        return snapshot
+
+
 def dashboard():
-    snapshot = get_portfolio_snapshot()
+    from flask import Response
+
+    state = current_state()
+    snapshot = dashboard_portfolio(state)
     portfolio = snapshot["portfolio_value_usd"] if snapshot else 0.0
     usd = snapshot["usd_balance"] if snapshot else 0.0
     btc = snapshot["btc_balance"] if snapshot else 0.0
     btc_price = snapshot["btc_price"] if snapshot else 0.0
     exposure = snapshot["btc_exposure"] if snapshot else 0.0
 
+    latest_signal = state["latest_signal"]
+
     fast_ma = latest_signal.get("fast_ma")
     slow_ma = latest_signal.get("slow_ma")
     long_ma = latest_signal.get("long_ma")
@@ -605,8 +1269,28 @@ def dashboard():
     def value_text(value):
         return "Väntar" if value is None else "{:.2f}".format(value)
 
-    with state_lock:
-        recent_entries = list(reversed(transaction_log[-20:]))
+    daily_bars = state["bars"].get("1d") or []
+    if daily_bars:
+        day_range = "{:.2f} – {:.2f}".format(
+            daily_bars[-1]["low"], daily_bars[-1]["high"]
+        )
+    else:
+        day_range = "Väntar"
+
+    shadow_rows = "".join(
+        "<li>{} → {:.2f} USD ({:+.2%}, {} affärer)</li>".format(
+            ", ".join(
+                "{} {}".format(name, value)
+                for name, value in variant["params"].items()
+            ),
+            variant["equity_usd"],
+            variant["return"],
+            variant["trades"]
+        )
+        for variant in state["shadows"]
+    ) or "<li>Väntar på första prisprovet</li>"
+
+    recent_entries = list(reversed(state["transaction_log"][-20:]))
 
     recent = "".join("<li>{}</li>".format(x) for x in recent_entries)
 
@@ -639,7 +1323,9 @@ body{{font-family:Arial;margin:24px;background:#f5f5f5}}
 <div class='card'><div class='label'>2h-snitt</div><div class='big'>{fast_ma}</div></div>
 <div class='card'><div class='label'>8h-snitt</div><div class='big'>{slow_ma}</div></div>
 <div class='card'><div class='label'>24h-snitt</div><div class='big'>{long_ma}</div></div>
+<div class='card'><div class='label'>Dagens lägsta – högsta</div><div class='big'>{day_range}</div></div>
 </div>
+<div class='card' style='margin-top:16px'><h2>Skuggstrategier</h2><div class='small'>{shadow_count} varianter, bäst först. Även som JSON på <a href='/api/shadow'>/api/shadow</a>.</div><ol>{shadows}</ol></div>
 <div class='card' style='margin-top:16px'><h2>Senaste logg</h2><ul>{recent}</ul></div>
 </body>
 </html>""".format(
@@ -648,8 +1334,8 @@ body{{font-family:Arial;margin:24px;background:#f5f5f5}}
         usd=usd,
         btc=btc,
         btc_price=btc_price,
-        action=latest_action,
-        reason=latest_reason,
+        action=state["latest_action"],
+        reason=state["latest_reason"],
         raw_signal=raw_signal,
         confirmations=confirmations,
         required=CONFIRMATION_CYCLES,
@@ -658,22 +1344,27 @@ body{{font-family:Arial;margin:24px;background:#f5f5f5}}
         fast_ma=value_text(fast_ma),
         slow_ma=value_text(slow_ma),
         long_ma=value_text(long_ma),
+        day_range=day_range,
+        shadow_count=len(state["shadows"]),
+        shadows=shadow_rows,
         recent=recent
     )
 
     return Response(html, mimetype="text/html")
 
 
-@app.route("/api/dashboard")
 def dashboard_api():
-    snapshot = get_portfolio_snapshot()
+    from flask import jsonify
+
+    state = current_state()
+    snapshot = dashboard_portfolio(state)
 
     return jsonify({
-        "latest_action": latest_action,
-        "latest_reason": latest_reason,
-        "latest_signal": latest_signal,
+        "latest_action": state["latest_action"],
+        "latest_reason": state["latest_reason"],
+        "latest_signal": state["latest_signal"],
         "portfolio": snapshot,
-        "btc_price_history_count": len(price_history["btc"]),
+        "btc_price_history_count": state["btc_price_history_count"],
         "settings": {
             "sample_seconds": PRICE_UPDATE_SECONDS,
             "fast_window": FAST_WINDOW,
@@ -686,15 +1377,194 @@ def dashboard_api():
             "buy_target_exposure": BUY_TARGET_BTC_EXPOSURE,
             "sell_target_exposure": SELL_TARGET_BTC_EXPOSURE
         },
-        "transaction_log": transaction_log
+        "startup": state["startup"],
+        "transaction_log": state["transaction_log"]
+    })
+
+
+def bars_api(timeframe):
+    from flask import jsonify, request
+
+    count = request.args.get("count", default=BAR_PUBLISH_COUNT, type=int)
+
+    if shared_reader is not None:
+        bars = current_state()["bars"].get(timeframe)
+        if bars is None:
+            return jsonify({"error": "Okänd tidsram: {}".format(timeframe)}), 404
+        bars = bars[-count:] if count > 0 else []
+    else:
+        try:
+            bars = get_bars(timeframe, count)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 404
+
+    return jsonify({"timeframe": timeframe, "bars": bars})
+
+
+def performance_api():
+    from flask import jsonify
+
+    report = performance_tracker.report()
+    if report is None:
+        return jsonify({"error": "Ingen handelshistorik ännu"}), 404
+
+    return jsonify(report)
+
+
+def debug_memory_api():
+    from flask import jsonify
+
+    memory_monitor.sample()
+
+    return jsonify({
+        "budget_mb": MEMORY_BUDGET_MB or None,
+        "rss_history": memory_monitor.history(),
+        "engine_rss_history": current_state()["memory"],
+        "tracemalloc": memory_monitor.top_allocators()
     })
 
 
-@app.route("/")
+def shadow_api():
+    from flask import jsonify
+
+    return jsonify({
+        "grid": SHADOW_GRID,
+        "fee_rate": SHADOW_FEE_RATE,
+        "variants": current_state()["shadows"]
+    })
+
+
+def ledger_api():
+    from flask import jsonify, request
+
+    state = current_state()
+    snapshot = state["portfolio"] or portfolio_cache["snapshot"]
+    btc_price = snapshot["btc_price"] if snapshot else None
+
+    return jsonify(get_ledger().summary(
+        btc_price=btc_price,
+        since=request.args.get("since")
+    ))
+
+
 def home():
     return dashboard()
 
 
+def create_app(shared=False):
+    """
+    Creates the Flask app. Flask is imported here, not at module
+    level, so the trading loop can start before the web server.
+
+    With shared=True the app only reads the state published by a
+    separate engine process, so it can run under a multi-worker
+    WSGI server:
+
+        python main_btc_raspberry.py engine
+        gunicorn -w 4 "main_btc_raspberry:create_app(shared=True)"
+    """
+    global app
+    global shared_reader
+
+    from flask import Flask
+
+    if shared:
+        shared_reader = shared_state.SharedStateReader(SHARED_STATE_FILE)
+
+    app = Flask(__name__)
+    app.add_url_rule("/dashboard", view_func=dashboard)
+    app.add_url_rule("/api/dashboard", view_func=dashboard_api)
+    app.add_url_rule("/api/bars/<timeframe>", view_func=bars_api)
+    app.add_url_rule("/api/performance", view_func=performance_api)
+    app.add_url_rule("/api/shadow", view_func=shadow_api)
+    app.add_url_rule("/api/ledger", view_func=ledger_api)
+    app.add_url_rule("/debug/memory", view_func=debug_memory_api)
+    app.add_url_rule("/", view_func=home)
+    return app
+
+
+def run_engine():
+    global shared_writer
+
+    shared_writer = shared_state.SharedStateWriter(SHARED_STATE_FILE)
+    log("Publishing engine state to {}".format(SHARED_STATE_FILE))
+    trading_bot()
+
+
+def run_replay(path, speed=0.0, profile=False):
+    """
+    Feeds a recorded tape through trade_logic against a paper
+    account. speed is the replay rate (1 = real time); 0 runs
+    as fast as possible.
+    """
+    global replayer, HISTORY_FILE, LEDGER_FILE
+
+    from mock_exchange import MockExchange
+
+    replayer = tape.Replayer(path, MockExchange(usd=REPLAY_START_USD))
+    HISTORY_FILE = Path(str(path) + ".history.csv")
+    LEDGER_FILE = Path(str(path) + ".ledger.sqlite3")
+    for leftover in (HISTORY_FILE, LEDGER_FILE):
+        if leftover.exists():
+            leftover.unlink()
+    ensure_history_file()
+
+    log("Replaying {} ({:.1f} h) at {}".format(
+        path,
+        (replayer.end - replayer.start) / 3600,
+        "{:g}x".format(speed) if speed > 0 else "full speed"
+    ))
+
+    def replay_cycles():
+        cycles = 0
+        while replayer.clock <= replayer.end:
+            trade_logic()
+            if ledger_sync_due():
+                sync_ledger()
+            cycles += 1
+            replayer.advance(PRICE_UPDATE_SECONDS)
+            if speed > 0:
+                time.sleep(PRICE_UPDATE_SECONDS / speed)
+        return cycles
+
+    started = time.perf_counter()
+    if profile:
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        cycles = profiler.runcall(replay_cycles)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+    else:
+        cycles = replay_cycles()
+
+    log("Replay finished: {} cycles in {:.2f} s, {}".format(
+        cycles, time.perf_counter() - started, latest_reason
+    ))
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "engine":
+        run_engine()
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        import argparse
+
+        parser = argparse.ArgumentParser(prog="main_btc_raspberry.py replay")
+        parser.add_argument("tape")
+        parser.add_argument("--speed", type=float, default=0.0,
+                            help="1 to 1000 times real time, 0 for full speed")
+        parser.add_argument("--profile", action="store_true")
+        args = parser.parse_args(sys.argv[2:])
+
+        run_replay(Path(args.tape), args.speed, args.profile)
+        sys.exit(0)
+
     threading.Thread(target=trading_bot, daemon=True).start()
+    mark_startup_phase("trading thread")
+
+    create_app()
+    mark_startup_phase("web server")
+
     app.run(host="0.0.0.0", port=5000, debug=False)
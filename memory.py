@@ -0,0 +1,78 @@
+import os
+import resource
+import time
+import tracemalloc
+from collections import deque
+
+
+# ============================================================
+# Memory monitoring
+#
+# RSS is read from /proc/self/statm where available (the Pi),
+# with the peak RSS from getrusage as a fallback. tracemalloc
+# is optional because tracing every allocation costs both CPU
+# and memory; start it with TRACEMALLOC=<frames>.
+# ============================================================
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss():
+    """
+    Returns the resident set size in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryMonitor:
+
+    def __init__(self, history_size=288, trace_frames=0):
+        self.samples = deque(maxlen=history_size)
+        if trace_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(trace_frames)
+
+    def sample(self):
+        rss = current_rss()
+        self.samples.append((time.time(), rss))
+        return rss
+
+    def history(self):
+        return [
+            {
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)),
+                "rss_mb": round(rss / 1048576.0, 2)
+            }
+            for ts, rss in self.samples
+        ]
+
+    def top_allocators(self, limit=15):
+        if not tracemalloc.is_tracing():
+            return None
+
+        statistics = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>")
+        )).statistics("lineno")
+
+        traced, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_mb": round(traced / 1048576.0, 2),
+            "peak_mb": round(peak / 1048576.0, 2),
+            "top": [
+                {
+                    "location": "{}:{}".format(
+                        stat.traceback[0].filename, stat.traceback[0].lineno
+                    ),
+                    "size_kb": round(stat.size / 1024.0, 1),
+                    "count": stat.count
+                }
+                for stat in statistics[:limit]
+            ]
+        }
@@ -0,0 +1,148 @@
+"""
+Local stand-in for the Bitstamp endpoints the bot uses.
+
+    python mock_exchange.py --delay 2.0
+    BITSTAMP_BASE_URL=http://127.0.0.1:8765/api/v2 python main_btc_raspberry.py
+
+Prices follow a random walk. Orders fill immediately at the
+limit price against an in-memory balance. --delay makes every
+response slow, to see how the dashboard behaves when Bitstamp is.
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class MockExchange:
+
+    def __init__(self, price=60000.0, usd=1000.0, btc=0.0, delay=0.0, seed=1):
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.price = price
+        self.balances = {"usd": usd, "btc": btc}
+        self.delay = delay
+        self.next_id = 1
+        self.transactions = []
+
+    def ticker(self):
+        with self.lock:
+            self.price *= math.exp(self.rng.gauss(0.0, 0.002))
+            return {"last": "{:.2f}".format(self.price)}
+
+    def balance(self):
+        with self.lock:
+            return {
+                "{}_balance".format(currency): "{:.8f}".format(amount)
+                for currency, amount in self.balances.items()
+            }
+
+    def user_transactions(self, form):
+        since_id = int(form.get("since_id", 0))
+        limit = int(form.get("limit", 100))
+        with self.lock:
+            return [t for t in self.transactions if t["id"] >= since_id][:limit]
+
+    def order(self, side, form):
+        amount = float(form.get("amount", 0))
+        price = float(form.get("price", self.price))
+
+        with self.lock:
+            if side == "buy":
+                cost = amount * price
+                if cost > self.balances["usd"]:
+                    return 400, {"status": "error", "reason": "Insufficient USD"}
+                self.balances["usd"] -= cost
+                self.balances["btc"] += amount
+            else:
+                if amount > self.balances["btc"]:
+                    return 400, {"status": "error", "reason": "Insufficient BTC"}
+                self.balances["btc"] -= amount
+                self.balances["usd"] += amount * price
+
+            order_id = self.next_id
+            self.next_id += 1
+
+            usd = amount * price
+            self.transactions.append({
+                "id": order_id,
+                "datetime": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "type": "2",
+                "usd": "{:.2f}".format(-usd if side == "buy" else usd),
+                "btc": "{:.8f}".format(amount if side == "buy" else -amount),
+                "btc_usd": "{:.2f}".format(price),
+                "fee": "0.00",
+                "order_id": order_id
+            })
+
+        return 200, {"id": order_id, "amount": str(amount), "price": str(price)}
+
+
+def make_handler(exchange):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _send(self, status, payload):
+            if exchange.delay:
+                time.sleep(exchange.delay)
+
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith("/api/v2/ticker/"):
+                self._send(200, exchange.ticker())
+            else:
+                self._send(404, {"status": "error"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            form = {
+                key: values[0]
+                for key, values in parse_qs(self.rfile.read(length).decode()).items()
+            }
+
+            if self.path == "/api/v2/balance/":
+                self._send(200, exchange.balance())
+            elif self.path == "/api/v2/user_transactions/":
+                self._send(200, exchange.user_transactions(form))
+            elif self.path.startswith("/api/v2/buy/"):
+                self._send(*exchange.order("buy", form))
+            elif self.path.startswith("/api/v2/sell/"):
+                self._send(*exchange.order("sell", form))
+            else:
+                self._send(404, {"status": "error"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Bitstamp API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--usd", type=float, default=1000.0)
+    parser.add_argument("--btc", type=float, default=0.0)
+    args = parser.parse_args()
+
+    exchange = MockExchange(usd=args.usd, btc=args.btc, delay=args.delay)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(exchange))
+    print("Mock exchange on http://127.0.0.1:{}/api/v2 (delay {:.2f} s)".format(
+        args.port, args.delay
+    ))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import csv
+import math
+import os
+import threading
+from datetime import datetime
+
+
+# ============================================================
+# Performance analytics over trading_history.csv
+#
+# The history file only grows, so the tracker remembers how far
+# it has read and folds new rows into running aggregates. A
+# report is rebuilt only when the file size or mtime changes.
+#
+# Orders are placed after a row's decision, so their balance
+# change shows up in the next row. Fills are approximated by the
+# BTC price of the decision row.
+# ============================================================
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+IN_MARKET_EXPOSURE = 0.01
+MIN_BTC_CHANGE = 1e-8
+MAX_EXPOSURE_POINTS = 500
+
+
+def _number(row, column):
+    try:
+        return float(row[column])
+    except (KeyError, ValueError):
+        return None
+
+
+class PerformanceTracker:
+
+    def __init__(self, path, sample_seconds):
+        self.path = path
+        self.periods_per_year = 365 * 24 * 60 * 60 / float(sample_seconds)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._key = None
+        self._report = None
+        self._offset = 0
+        self._columns = None
+
+        self.rows = 0
+        self.first_time = None
+        self.last_time = None
+        self.first_value = None
+        self.last_value = None
+        self.last_price = None
+        self.last_btc = None
+        self.last_exposure = None
+
+        # Welford mean/variance of per-sample returns
+        self.return_count = 0
+        self.return_mean = 0.0
+        self.return_m2 = 0.0
+        self.downside_squares = 0.0
+
+        self.peak = 0.0
+        self.max_drawdown = 0.0
+
+        self.cost_basis = 0.0
+        self.realized_pnl = 0.0
+
+        self.seconds_in_market = 0.0
+        self.seconds_total = 0.0
+
+        self.exposure = []
+        self.exposure_stride = 1
+
+        self.buys = 0
+        self.sells = 0
+        self.traded_usd = 0.0
+        self.winning_sells = 0
+        self.best_sell_pnl = None
+        self.worst_sell_pnl = None
+
+    def report(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+
+        key = (stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            if key == self._key:
+                return self._report
+
+            if stat.st_size < self._offset:
+                # The file was replaced or truncated.
+                self._reset()
+
+            self._read_new_rows()
+            self._key = key
+            self._report = self._build_report()
+            return self._report
+
+    def shrink(self):
+        """
+        Halves the resolution of the exposure series.
+        """
+        with self._lock:
+            self.exposure = self.exposure[::2]
+            self.exposure_stride *= 2
+            self._key = None
+
+    def _read_new_rows(self):
+        with open(self.path, "rb") as history:
+            history.seek(self._offset)
+            data = history.read()
+
+        # Leave a partly written last line for the next read.
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return
+
+        self._offset += end
+        lines = data[:end].decode("utf-8").splitlines()
+
+        reader = csv.reader(lines)
+        if self._columns is None:
+            self._columns = next(reader, None)
+            if self._columns is None:
+                return
+
+        for values in reader:
+            self._add_row(dict(zip(self._columns, values)))
+
+    def _add_row(self, row):
+        value = _number(row, "portfolio_value_usd")
+        price = _number(row, "btc_price")
+        btc = _number(row, "btc_balance")
+        exposure = _number(row, "btc_exposure")
+        if value is None or price is None or btc is None or exposure is None:
+            return
+
+        try:
+            timestamp = datetime.strptime(row["timestamp"], TIME_FORMAT)
+        except (KeyError, ValueError):
+            return
+
+        self.rows += 1
+
+        if self.last_value is None:
+            self.first_time = timestamp
+            self.first_value = value
+            self.cost_basis = btc * price
+        else:
+            if self.last_value > 0:
+                change = value / self.last_value - 1.0
+                self.return_count += 1
+                delta = change - self.return_mean
+                self.return_mean += delta / self.return_count
+                self.return_m2 += delta * (change - self.return_mean)
+                if change < 0:
+                    self.downside_squares += change * change
+
+            elapsed = (timestamp - self.last_time).total_seconds()
+            if elapsed > 0:
+                self.seconds_total += elapsed
+                if self.last_exposure > IN_MARKET_EXPOSURE:
+                    self.seconds_in_market += elapsed
+
+            self._add_balance_change(btc - self.last_btc, self.last_price)
+
+        if value > self.peak:
+            self.peak = value
+        elif self.peak > 0:
+            self.max_drawdown = max(
+                self.max_drawdown, (self.peak - value) / self.peak
+            )
+
+        self.last_time = timestamp
+        self.last_value = value
+        self.last_price = price
+        self.last_btc = btc
+        self.last_exposure = exposure
+
+        if self.rows % self.exposure_stride == 0:
+            self.exposure.append((row["timestamp"], exposure))
+            if len(self.exposure) > MAX_EXPOSURE_POINTS:
+                # Halve the resolution to keep the series bounded.
+                self.exposure = self.exposure[::2]
+                self.exposure_stride *= 2
+
+    def _add_balance_change(self, change, price):
+        if abs(change) < MIN_BTC_CHANGE:
+            return
+
+        self.traded_usd += abs(change) * price
+
+        if change > 0:
+            self.buys += 1
+            self.cost_basis += change * price
+            return
+
+        sold = -change
+        average_cost = self.cost_basis / self.last_btc if self.last_btc else price
+        pnl = sold * (price - average_cost)
+
+        self.sells += 1
+        self.realized_pnl += pnl
+        self.cost_basis -= sold * average_cost
+
+        if pnl > 0:
+            self.winning_sells += 1
+        if self.best_sell_pnl is None or pnl > self.best_sell_pnl:
+            self.best_sell_pnl = pnl
+        if self.worst_sell_pnl is None or pnl < self.worst_sell_pnl:
+            self.worst_sell_pnl = pnl
+
+    def _build_report(self):
+        if not self.rows:
+            return {"rows": 0}
+
+        sharpe = None
+        sortino = None
+        if self.return_count > 1:
+            deviation = math.sqrt(self.return_m2 / (self.return_count - 1))
+            downside = math.sqrt(self.downside_squares / self.return_count)
+            scale = math.sqrt(self.periods_per_year)
+            if deviation > 0:
+                sharpe = self.return_mean / deviation * scale
+            if downside > 0:
+                sortino = self.return_mean / downside * scale
+
+        trades = self.buys + self.sells
+
+        return {
+            "rows": self.rows,
+            "start": self.first_time.strftime(TIME_FORMAT),
+            "end": self.last_time.strftime(TIME_FORMAT),
+            "portfolio_value_usd": self.last_value,
+            "total_return": (
+                self.last_value / self.first_value - 1.0
+                if self.first_value else None
+            ),
+            "realized_pnl_usd": self.realized_pnl,
+            "unrealized_pnl_usd": self.last_btc * self.last_price - self.cost_basis,
+            "cost_basis_usd": self.cost_basis,
+            "max_drawdown": self.max_drawdown,
+            "current_drawdown": (
+                (self.peak - self.last_value) / self.peak if self.peak else 0.0
+            ),
+            "sharpe": sharpe,
+            "sortino": sortino,
+            "time_in_market_hours": self.seconds_in_market / 3600.0,
+            "time_in_market_ratio": (
+                self.seconds_in_market / self.seconds_total
+                if self.seconds_total else 0.0
+            ),
+            "exposure": [
+                {"timestamp": timestamp, "btc_exposure": exposure}
+                for timestamp, exposure in self.exposure
+            ],
+            "trades": {
+                "count": trades,
+                "buys": self.buys,
+                "sells": self.sells,
+                "average_size_usd": self.traded_usd / trades if trades else 0.0,
+                "sell_win_rate": (
+                    self.winning_sells / float(self.sells) if self.sells else None
+                ),
+                "average_sell_pnl_usd": (
+                    self.realized_pnl / self.sells if self.sells else None
+                ),
+                "best_sell_pnl_usd": self.best_sell_pnl,
+                "worst_sell_pnl_usd": self.worst_sell_pnl
+            }
+        }
@@ -0,0 +1,415 @@
+"""
+Walk-forward and Monte Carlo checks of the Raspberry strategy.
+
+    python robustness.py walkforward --csv trading_history.csv
+    python robustness.py montecarlo --paths 10000 --block 96
+
+Both modes spread the work over a process pool and print results
+as soon as each batch finishes.
+"""
+
+import argparse
+import csv
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import strategy
+
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# The live settings, plus what a simulation needs to start.
+DEFAULT_PARAMS = dict(
+    strategy.PARAMS,
+    fee_rate=strategy.FEE_RATE,
+    start_usd=1000.0
+)
+
+DEFAULT_GRID = {
+    "buy_buffer": [0.0025, 0.005, 0.0075, 0.01, 0.015],
+    "sell_buffer": [0.0035, 0.007, 0.0105, 0.014, 0.02],
+    "confirmation_cycles": [2, 3, 4]
+}
+
+
+def simulate(prices, params, warmup=0):
+    """
+    Runs the strategy over a price series, one cycle per sample,
+    with the same signal, confirmation, cooldown and target
+    exposure rules as trade_logic. Samples before warmup only
+    fill the averages.
+    """
+    fast_window = params["fast_window"]
+    slow_window = params["slow_window"]
+    long_window = params["long_window"]
+    buy_factor = 1.0 + params["buy_buffer"]
+    sell_factor = 1.0 - params["sell_buffer"]
+    confirmation_cycles = params["confirmation_cycles"]
+    cooldown = params["cooldown_seconds"]
+    sample_seconds = params["sample_seconds"]
+    buy_target = params["buy_target"]
+    sell_target = params["sell_target"]
+    min_trade = params["min_trade"]
+    keep = 1.0 - params["fee_rate"]
+
+    totals = [0.0]
+    for price in prices:
+        totals.append(totals[-1] + price)
+
+    usd = params["start_usd"]
+    btc = 0.0
+    pending = None
+    pending_count = 0
+    last_trade = None
+    trades = 0
+
+    start_value = None
+    peak = 0.0
+    max_drawdown = 0.0
+    value = usd
+
+    for i in range(warmup, len(prices)):
+        price = prices[i]
+        n = i + 1
+
+        signal = "HOLD"
+        if n >= slow_window:
+            fast = (totals[n] - totals[n - fast_window]) / fast_window
+            slow = (totals[n] - totals[n - slow_window]) / slow_window
+            long = None
+            if n >= long_window:
+                long = (totals[n] - totals[n - long_window]) / long_window
+
+            if fast > slow * buy_factor and (long is None or slow >= long):
+                signal = "BUY"
+            elif fast < slow * sell_factor and (long is None or slow <= long):
+                signal = "SELL"
+
+        if signal == "HOLD":
+            pending = None
+            pending_count = 0
+        elif signal == pending:
+            pending_count += 1
+        else:
+            pending = signal
+            pending_count = 1
+
+        now = i * sample_seconds
+        if (pending_count >= confirmation_cycles and
+                (last_trade is None or now - last_trade >= cooldown)):
+            btc_value = btc * price
+            portfolio = usd + btc_value
+            traded = False
+
+            if signal == "BUY":
+                usd_to_buy = min(portfolio * buy_target - btc_value, usd)
+                if usd_to_buy >= min_trade:
+                    btc += usd_to_buy * keep / price
+                    usd -= usd_to_buy
+                    traded = True
+            else:
+                usd_to_sell = btc_value - portfolio * sell_target
+                btc_to_sell = min(usd_to_sell / price, btc)
+                if usd_to_sell >= min_trade and btc_to_sell * price >= min_trade:
+                    usd += btc_to_sell * price * keep
+                    btc -= btc_to_sell
+                    traded = True
+
+            if traded:
+                trades += 1
+                last_trade = now
+                pending = None
+                pending_count = 0
+
+        value = usd + btc * price
+        if start_value is None:
+            start_value = value
+        if value > peak:
+            peak = value
+        elif peak > 0:
+            max_drawdown = max(max_drawdown, (peak - value) / peak)
+
+    if start_value is None:
+        start_value = value
+
+    return {
+        "return": value / start_value - 1.0 if start_value else 0.0,
+        "max_drawdown": max_drawdown,
+        "trades": trades
+    }
+
+
+def load_prices(path, column="btc_price"):
+    prices = []
+    with open(path, newline="") as csv_file:
+        for row in csv.DictReader(csv_file):
+            try:
+                prices.append(float(row[column]))
+            except (KeyError, ValueError):
+                continue
+    return prices
+
+
+def parameter_grid(grid):
+    names = sorted(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(DEFAULT_PARAMS)
+        params.update(zip(names, values))
+        yield params
+
+
+def describe(params, grid):
+    return " ".join(
+        "{}={}".format(name, params[name]) for name in sorted(grid)
+    )
+
+
+# ============================================================
+# Walk-forward
+# ============================================================
+
+def walk_forward_split(split, prices, train_start, test_start, test_end, grid):
+    warmup = DEFAULT_PARAMS["long_window"]
+    train = prices[train_start:test_start]
+
+    best = None
+    for params in parameter_grid(grid):
+        result = simulate(train, params, warmup=warmup)
+        if best is None or result["return"] > best[1]["return"]:
+            best = (params, result)
+
+    # The test segment is preceded by enough samples to fill the
+    # averages, but only trades inside the segment count.
+    test_from = max(0, test_start - warmup)
+    test = prices[test_from:test_end]
+    optimized = simulate(test, best[0], warmup=test_start - test_from)
+    current = simulate(test, DEFAULT_PARAMS, warmup=test_start - test_from)
+
+    return {
+        "split": split,
+        "params": best[0],
+        "train": best[1],
+        "test": optimized,
+        "current": current
+    }
+
+
+def run_walk_forward(prices, train_size, test_size, grid, workers):
+    splits = []
+    start = 0
+    while start + train_size + test_size <= len(prices):
+        splits.append((start, start + train_size, start + train_size + test_size))
+        start += test_size
+
+    if not splits:
+        print("Not enough samples: {} (need at least {})".format(
+            len(prices), train_size + test_size
+        ))
+        return []
+
+    print("{} splits, {} parameter sets each, {} workers".format(
+        len(splits), len(list(parameter_grid(grid))), workers
+    ))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(walk_forward_split, split, prices,
+                        train_start, test_start, test_end, grid)
+            for split, (train_start, test_start, test_end) in enumerate(splits)
+        ]
+
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print("Split {:>3} | {} | train {:+.2%} | test {:+.2%} "
+                  "(current {:+.2%}) | trades {}".format(
+                      result["split"],
+                      describe(result["params"], grid),
+                      result["train"]["return"],
+                      result["test"]["return"],
+                      result["current"]["return"],
+                      result["test"]["trades"]
+                  ))
+            sys.stdout.flush()
+
+    results.sort(key=lambda item: item["split"])
+    optimized = math.prod(1.0 + r["test"]["return"] for r in results) - 1.0
+    current = math.prod(1.0 + r["current"]["return"] for r in results) - 1.0
+    in_sample = sum(r["train"]["return"] for r in results) / len(results)
+    out_of_sample = sum(r["test"]["return"] for r in results) / len(results)
+
+    print("Out-of-sample return: optimized {:+.2%}, current settings {:+.2%}".format(
+        optimized, current
+    ))
+    print("Average per split: train {:+.2%}, test {:+.2%}".format(
+        in_sample, out_of_sample
+    ))
+    return results
+
+
+# ============================================================
+# Monte Carlo
+# ============================================================
+
+_worker_returns = None
+
+
+def _init_monte_carlo(returns):
+    global _worker_returns
+    _worker_returns = returns
+
+
+def resampled_path(rng, returns, length, block, start_price):
+    """
+    Builds a price path from blocks of consecutive historical log
+    returns. block=1 is a plain bootstrap.
+    """
+    path = [start_price]
+    price = start_price
+    last_start = len(returns) - block
+
+    while len(path) < length:
+        first = rng.randint(0, last_start)
+        for log_return in returns[first:first + block]:
+            price *= math.exp(log_return)
+            path.append(price)
+            if len(path) >= length:
+                break
+
+    return path
+
+
+def monte_carlo_batch(seed, count, length, block, start_price, params):
+    rng = random.Random(seed)
+    results = []
+    for _ in range(count):
+        path = resampled_path(rng, _worker_returns, length, block, start_price)
+        result = simulate(path, params, warmup=params["long_window"])
+        result["buy_and_hold"] = path[-1] / path[params["long_window"]] - 1.0
+        results.append(result)
+    return results
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def print_monte_carlo_summary(results, total):
+    returns = sorted(r["return"] for r in results)
+    drawdowns = sorted(r["max_drawdown"] for r in results)
+    beats = sum(1 for r in results if r["return"] > r["buy_and_hold"])
+
+    print("{:>6}/{} paths | return p5 {:+.2%} p50 {:+.2%} p95 {:+.2%} | "
+          "drawdown p50 {:.2%} p95 {:.2%} | beats buy-and-hold {:.1%}".format(
+              len(results),
+              total,
+              percentile(returns, 0.05),
+              percentile(returns, 0.50),
+              percentile(returns, 0.95),
+              percentile(drawdowns, 0.50),
+              percentile(drawdowns, 0.95),
+              beats / float(len(results))
+          ))
+    sys.stdout.flush()
+
+
+def run_monte_carlo(prices, paths, length, block, batch, params, workers, seed):
+    returns = [
+        math.log(b / a) for a, b in zip(prices, prices[1:]) if a > 0 and b > 0
+    ]
+    if len(returns) < block:
+        print("Not enough samples for block size {}".format(block))
+        return []
+
+    length = max(length, params["long_window"] + 1)
+    print("{} paths of {} samples, block {}, {} workers".format(
+        paths, length, block, workers
+    ))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_monte_carlo,
+                             initargs=(returns,)) as pool:
+        futures = []
+        for index, first in enumerate(range(0, paths, batch)):
+            futures.append(pool.submit(
+                monte_carlo_batch,
+                seed + index,
+                min(batch, paths - first),
+                length,
+                block,
+                prices[-1],
+                params
+            ))
+
+        for future in as_completed(futures):
+            results.extend(future.result())
+            print_monte_carlo_summary(results, paths)
+
+    return results
+
+
+def parse_list(text, kind=float):
+    return [kind(value) for value in text.split(",") if value]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("mode", choices=("walkforward", "montecarlo"))
+    parser.add_argument("--csv", default=str(BASE_DIR / "trading_history.csv"))
+    parser.add_argument("--column", default="btc_price")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+
+    parser.add_argument("--train", type=int, default=30 * 96,
+                        help="Training samples per split (default 30 days)")
+    parser.add_argument("--test", type=int, default=7 * 96,
+                        help="Test samples per split (default 7 days)")
+    parser.add_argument("--buy-buffers")
+    parser.add_argument("--sell-buffers")
+    parser.add_argument("--confirmations")
+
+    parser.add_argument("--paths", type=int, default=10000)
+    parser.add_argument("--length", type=int, default=30 * 96)
+    parser.add_argument("--block", type=int, default=96,
+                        help="Block length in samples, 1 for plain bootstrap")
+    parser.add_argument("--batch", type=int, default=250)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    prices = load_prices(args.csv, args.column)
+    if len(prices) < 2:
+        print("No prices found in {}".format(args.csv))
+        return 1
+
+    started = time.time()
+
+    if args.mode == "walkforward":
+        grid = dict(DEFAULT_GRID)
+        if args.buy_buffers:
+            grid["buy_buffer"] = parse_list(args.buy_buffers)
+        if args.sell_buffers:
+            grid["sell_buffer"] = parse_list(args.sell_buffers)
+        if args.confirmations:
+            grid["confirmation_cycles"] = parse_list(args.confirmations, int)
+
+        run_walk_forward(prices, args.train, args.test, grid, args.workers)
+    else:
+        run_monte_carlo(prices, args.paths, args.length, args.block,
+                        args.batch, DEFAULT_PARAMS, args.workers, args.seed)
+
+    print("Finished in {:.1f} s".format(time.time() - started))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import itertools
+
+import strategy
+
+
+# ============================================================
+# Shadow strategies
+#
+# Paper-trading variants of the live strategy, each with its own
+# parameters. All variants are stepped together with NumPy on
+# the same price sample the live strategy uses, so they cost no
+# exchange calls and very little CPU.
+#
+# The variants model the default signal only: simple fast, slow
+# and long averages with no extra conditions. The bot does not
+# start them when it is configured with other trend lines or
+# conditions.
+# ============================================================
+
+TREND_LINES = {
+    "fast": "fast_ma",
+    "slow": "slow_ma",
+    "long": "long_ma"
+}
+
+PARAMETERS = (
+    "fast_window",
+    "slow_window",
+    "buy_buffer",
+    "sell_buffer",
+    "confirmation_cycles",
+    "cooldown_seconds",
+    "buy_target",
+    "sell_target"
+)
+
+
+class ShadowBook:
+
+    def __init__(self, grid, base_params=None, fee_rate=None):
+        """
+        grid maps names in PARAMETERS to lists of values; one
+        variant is created per combination. The other parameters
+        come from base_params, by default the live settings in
+        strategy.PARAMS.
+        """
+        import numpy as np
+
+        if base_params is None:
+            base_params = strategy.PARAMS
+        if fee_rate is None:
+            fee_rate = strategy.FEE_RATE
+
+        self.np = np
+        self.long_window = base_params["long_window"]
+        self.min_trade = base_params["min_trade"]
+        self.keep = 1.0 - fee_rate
+
+        names = sorted(grid)
+        self.variants = []
+        for values in itertools.product(*(grid[name] for name in names)):
+            params = dict(base_params)
+            params.update(zip(names, values))
+            self.variants.append(params)
+
+        size = len(self.variants)
+        for name in PARAMETERS:
+            setattr(self, name, np.array([v[name] for v in self.variants], dtype=float))
+        self.fast_window = self.fast_window.astype(int)
+        self.slow_window = self.slow_window.astype(int)
+
+        self.usd = np.zeros(size)
+        self.btc = np.zeros(size)
+        self.pending = np.zeros(size, dtype=np.int8)
+        self.pending_count = np.zeros(size, dtype=np.int32)
+        self.last_trade = np.full(size, -np.inf)
+        self.trades = np.zeros(size, dtype=np.int32)
+        self.equity = np.zeros(size)
+        self.start_value = None
+
+    def _averages(self, totals, windows):
+        np = self.np
+        count = len(totals) - 1
+        clipped = np.minimum(windows, count)
+        averages = (totals[count] - totals[count - clipped]) / np.maximum(clipped, 1)
+        return np.where(windows <= count, averages, np.nan)
+
+    def update(self, prices, usd_balance, btc_balance, now):
+        """
+        Steps every variant with the newest sample, prices[-1].
+        The first call starts all variants from the live balances.
+        """
+        np = self.np
+        price = float(prices[-1])
+
+        if self.start_value is None:
+            self.usd[:] = usd_balance
+            self.btc[:] = btc_balance
+            self.start_value = usd_balance + btc_balance * price
+
+        totals = np.concatenate(([0.0], np.cumsum(np.asarray(prices, dtype=float))))
+        fast = self._averages(totals, self.fast_window)
+        slow = self._averages(totals, self.slow_window)
+
+        count = len(prices)
+        long = None
+        if count >= self.long_window:
+            long = (totals[count] - totals[count - self.long_window]) / self.long_window
+
+        long_buy_ok = True if long is None else slow >= long
+        long_sell_ok = True if long is None else slow <= long
+
+        with np.errstate(invalid="ignore"):
+            buy = (fast > slow * (1.0 + self.buy_buffer)) & long_buy_ok
+            sell = (fast < slow * (1.0 - self.sell_buffer)) & long_sell_ok
+        signal = np.where(buy, 1, np.where(sell, -1, 0)).astype(np.int8)
+
+        repeated = (signal == self.pending) & (signal != 0)
+        self.pending_count = np.where(
+            signal == 0, 0, np.where(repeated, self.pending_count + 1, 1)
+        )
+        self.pending = signal
+
+        ready = (
+            (signal != 0) &
+            (self.pending_count >= self.confirmation_cycles) &
+            (now - self.last_trade >= self.cooldown_seconds)
+        )
+
+        btc_value = self.btc * price
+        portfolio = self.usd + btc_value
+
+        wanted_buy = portfolio * self.buy_target - btc_value
+        usd_to_buy = np.minimum(wanted_buy, self.usd)
+        do_buy = (
+            ready & (signal == 1) &
+            (wanted_buy >= self.min_trade) & (usd_to_buy >= self.min_trade)
+        )
+
+        usd_to_sell = btc_value - portfolio * self.sell_target
+        btc_to_sell = np.minimum(usd_to_sell / price, self.btc)
+        do_sell = (
+            ready & (signal == -1) &
+            (usd_to_sell >= self.min_trade) & (btc_to_sell * price >= self.min_trade)
+        )
+
+        self.btc += np.where(do_buy, usd_to_buy * self.keep / price, 0.0)
+        self.usd -= np.where(do_buy, usd_to_buy, 0.0)
+        self.usd += np.where(do_sell, btc_to_sell * price * self.keep, 0.0)
+        self.btc -= np.where(do_sell, btc_to_sell, 0.0)
+
+        traded = do_buy | do_sell
+        self.last_trade = np.where(traded, now, self.last_trade)
+        self.pending = np.where(traded, 0, self.pending).astype(np.int8)
+        self.pending_count = np.where(traded, 0, self.pending_count)
+        self.trades += traded
+
+        self.equity = self.usd + self.btc * price
+
+    def summary(self, grid_names=None):
+        """
+        Returns one entry per variant, best equity first.
+        """
+        if self.start_value is None:
+            return []
+
+        names = grid_names or PARAMETERS
+        order = self.np.argsort(-self.equity)
+        return [
+            {
+                "params": {name: self.variants[i][name] for name in names},
+                "equity_usd": float(self.equity[i]),
+                "return": (
+                    float(self.equity[i] / self.start_value - 1.0)
+                    if self.start_value else 0.0
+                ),
+                "btc_exposure": (
+                    float(1.0 - self.usd[i] / self.equity[i])
+                    if self.equity[i] > 0 else 0.0
+                ),
+                "trades": int(self.trades[i])
+            }
+            for i in order
+        ]
@@ -0,0 +1,134 @@
+import json
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+
+
+# ============================================================
+# Shared engine state
+#
+# The trading engine is the only writer. It publishes its state
+# into a memory-mapped file guarded by a sequence lock:
+#
+#   sequence (u64) | payload length (u32) | padding | payload
+#
+# The writer makes the sequence odd, writes the payload and
+# makes it even again. Readers copy the payload and retry if
+# the sequence was odd or changed while they were reading, so
+# any number of web workers get consistent snapshots without
+# locks and without ever blocking the writer.
+#
+# The payload is JSON, so a reader has to copy and decode it.
+# Each reader keeps the decoded state for the newest sequence,
+# so this happens once per publish and not once per request.
+# ============================================================
+
+SEQUENCE = struct.Struct("<Q")
+LENGTH = struct.Struct("<I")
+LENGTH_OFFSET = 8
+PAYLOAD_OFFSET = 16
+DEFAULT_SIZE = 1024 * 1024
+
+
+def default_path(base_dir):
+    if os.path.isdir("/dev/shm"):
+        return Path("/dev/shm") / "daytrader_state"
+    return Path(base_dir) / "engine_state.shm"
+
+
+class SharedStateWriter:
+
+    def __init__(self, path, size=DEFAULT_SIZE):
+        self.path = Path(path)
+        self.size = size
+
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        self._sequence, = SEQUENCE.unpack_from(self._map, 0)
+        if self._sequence % 2:
+            # A previous writer died mid-update.
+            self._sequence += 1
+
+    def publish(self, state):
+        payload = json.dumps(state, separators=(",", ":")).encode("utf-8")
+        if PAYLOAD_OFFSET + len(payload) > self.size:
+            raise ValueError("Shared state is {} bytes, region holds {}".format(
+                len(payload), self.size - PAYLOAD_OFFSET
+            ))
+
+        self._sequence += 1
+        SEQUENCE.pack_into(self._map, 0, self._sequence)
+
+        self._map[PAYLOAD_OFFSET:PAYLOAD_OFFSET + len(payload)] = payload
+        LENGTH.pack_into(self._map, LENGTH_OFFSET, len(payload))
+
+        self._sequence += 1
+        SEQUENCE.pack_into(self._map, 0, self._sequence)
+
+
+class SharedStateReader:
+
+    def __init__(self, path, retries=100):
+        self.path = Path(path)
+        self.retries = retries
+        self._map = None
+        self._cached = (None, None)
+
+    def _open(self):
+        try:
+            fd = os.open(str(self.path), os.O_RDONLY)
+        except OSError:
+            return False
+
+        try:
+            size = os.fstat(fd).st_size
+            if size < PAYLOAD_OFFSET:
+                return False
+            self._map = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+        return True
+
+    def read(self):
+        """
+        Returns the newest published state, or None if the engine
+        has not published anything yet. The returned dict is shared
+        between callers until the next publish and must not be
+        modified.
+        """
+        if self._map is None and not self._open():
+            return None
+
+        view = memoryview(self._map)
+        try:
+            for _ in range(self.retries):
+                before, = SEQUENCE.unpack_from(view, 0)
+                if before == 0:
+                    return None
+
+                cached_sequence, cached_state = self._cached
+                if before == cached_sequence:
+                    return cached_state
+
+                if before % 2 == 0:
+                    length, = LENGTH.unpack_from(view, LENGTH_OFFSET)
+                    payload = bytes(view[PAYLOAD_OFFSET:PAYLOAD_OFFSET + length])
+                    after, = SEQUENCE.unpack_from(view, 0)
+                    if after == before:
+                        state = json.loads(payload)
+                        self._cached = (before, state)
+                        return state
+
+                time.sleep(0)
+        finally:
+            view.release()
+
+        return None
@@ -0,0 +1,49 @@
+# ============================================================
+# Calmer strategy
+#
+# One price sample every 15 minutes.
+#  8 samples  = 2-hour average
+# 32 samples  = 8-hour average
+# 96 samples  = 24-hour average
+#
+# A signal must be repeated three times before a trade.
+# At least six hours must pass between completed trades.
+# Instead of trading 75%, the bot moves toward target exposure.
+#
+# The live bot, the shadow strategies and robustness.py all read
+# these values, so this module must not need API keys or any
+# third-party package.
+# ============================================================
+
+PRICE_UPDATE_SECONDS = 900
+
+FAST_WINDOW = 8
+SLOW_WINDOW = 32
+LONG_WINDOW = 96
+
+BUY_BUFFER = 0.005          # Fast average must be 0.5% above slow average
+SELL_BUFFER = 0.007         # Fast average must be 0.7% below slow average
+CONFIRMATION_CYCLES = 3     # Signal must remain for 45 minutes
+TRADE_COOLDOWN_SECONDS = 6 * 60 * 60
+
+BUY_TARGET_BTC_EXPOSURE = 0.65
+SELL_TARGET_BTC_EXPOSURE = 0.20
+MIN_TRADE_AMOUNT = 10.0
+
+# Assumed fee per order in simulations
+FEE_RATE = 0.004
+
+# The settings above under the names simulations use.
+PARAMS = {
+    "sample_seconds": PRICE_UPDATE_SECONDS,
+    "fast_window": FAST_WINDOW,
+    "slow_window": SLOW_WINDOW,
+    "long_window": LONG_WINDOW,
+    "buy_buffer": BUY_BUFFER,
+    "sell_buffer": SELL_BUFFER,
+    "confirmation_cycles": CONFIRMATION_CYCLES,
+    "cooldown_seconds": TRADE_COOLDOWN_SECONDS,
+    "buy_target": BUY_TARGET_BTC_EXPOSURE,
+    "sell_target": SELL_TARGET_BTC_EXPOSURE,
+    "min_trade": MIN_TRADE_AMOUNT
+}
@@ -0,0 +1,362 @@
+import json
+import struct
+import threading
+from bisect import bisect_right
+from pathlib import Path
+
+
+# ============================================================
+# Market data tape
+#
+# An append-only binary log of exchange GET responses. Record
+# times are stored as millisecond deltas, and JSON objects are
+# stored as changes against the previous response from the same
+# endpoint. Every hour a new segment starts with an absolute
+# timestamp and fresh delta state, and the segment's offset is
+# written to <tape>.idx, so a reader can start at any hour.
+#
+# File:     MAGIC | version | records...
+# Segment:  0 | time ms (u64)
+# Endpoint: 1 | id | length | utf-8 path
+# Full:     2 | dt ms | endpoint id | length | body
+# Delta:    3 | dt ms | endpoint id | length | JSON [changed, removed]
+#
+# Numbers other than the segment time are unsigned varints.
+# ============================================================
+
+MAGIC = b"DTTP"
+VERSION = 1
+
+SEGMENT = 0
+ENDPOINT = 1
+FULL = 2
+DELTA = 3
+
+SEGMENT_SECONDS = 60 * 60
+SEGMENT_TIME = struct.Struct("<Q")
+INDEX_ENTRY = struct.Struct("<QQ")
+
+
+def _varint(value):
+    encoded = bytearray()
+    while value >= 0x80:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _read_varint(data, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _parse_object(body):
+    try:
+        parsed = json.loads(body)
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def _dump(value):
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+class TapeRecorder:
+
+    def __init__(self, path):
+        self.path = Path(path)
+        index_path = Path(str(self.path) + ".idx")
+        is_new = not self.path.exists() or self.path.stat().st_size == 0
+
+        if not is_new:
+            self._truncate_torn_tail(index_path)
+
+        self.file = self.path.open("ab")
+        self.index = index_path.open("ab")
+        if is_new:
+            self.file.write(MAGIC + bytes([VERSION]))
+
+        self.lock = threading.Lock()
+        self.segment_start = None
+        self.last_ms = 0
+        self.endpoints = {}
+        self.previous = {}
+
+    def _truncate_torn_tail(self, index_path):
+        """
+        Cuts a record torn by a crash off the end of the tape, and
+        index entries pointing past the cut, so new records follow
+        the last complete one.
+        """
+        data = self.path.read_bytes()
+        _check_header(data, self.path)
+
+        end = len(MAGIC) + 1
+        for _, _, end in _records(data, end):
+            pass
+
+        if end < len(data):
+            with self.path.open("r+b") as handle:
+                handle.truncate(end)
+
+        try:
+            index = index_path.read_bytes()
+        except OSError:
+            return
+
+        kept = bytearray()
+        for position in range(0, len(index) - INDEX_ENTRY.size + 1, INDEX_ENTRY.size):
+            entry = index[position:position + INDEX_ENTRY.size]
+            if INDEX_ENTRY.unpack(entry)[1] < end:
+                kept += entry
+
+        if len(kept) != len(index):
+            index_path.write_bytes(bytes(kept))
+
+    def _start_segment(self, ms):
+        offset = self.file.tell()
+        self.file.write(bytes([SEGMENT]) + SEGMENT_TIME.pack(ms))
+        self.index.write(INDEX_ENTRY.pack(ms, offset))
+        self.index.flush()
+
+        self.segment_start = ms
+        self.last_ms = ms
+        self.endpoints = {}
+        self.previous = {}
+
+    def record(self, timestamp, endpoint, body):
+        ms = int(timestamp * 1000)
+
+        with self.lock:
+            if (self.segment_start is None or ms < self.last_ms or
+                    ms - self.segment_start >= SEGMENT_SECONDS * 1000):
+                self._start_segment(ms)
+
+            record = b""
+            endpoint_id = self.endpoints.get(endpoint)
+            if endpoint_id is None:
+                endpoint_id = len(self.endpoints)
+                self.endpoints[endpoint] = endpoint_id
+                encoded = endpoint.encode("utf-8")
+                record += (
+                    bytes([ENDPOINT]) + _varint(endpoint_id) +
+                    _varint(len(encoded)) + encoded
+                )
+
+            parsed = _parse_object(body)
+            previous = self.previous.get(endpoint_id)
+
+            if parsed is not None and previous is not None:
+                changed = {
+                    key: value for key, value in parsed.items()
+                    if key not in previous or previous[key] != value
+                }
+                removed = [key for key in previous if key not in parsed]
+                kind = DELTA
+                payload = _dump([changed, removed])
+            else:
+                kind = FULL
+                payload = body
+
+            self.previous[endpoint_id] = parsed
+            record += (
+                bytes([kind]) + _varint(ms - self.last_ms) +
+                _varint(endpoint_id) + _varint(len(payload)) + payload
+            )
+
+            self.file.write(record)
+            self.file.flush()
+            self.last_ms = ms
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+            self.index.close()
+
+
+def _segment_offset(path, start):
+    try:
+        index = Path(str(path) + ".idx").read_bytes()
+    except OSError:
+        return None
+
+    offset = None
+    for position in range(0, len(index) - INDEX_ENTRY.size + 1, INDEX_ENTRY.size):
+        ms, segment_offset = INDEX_ENTRY.unpack_from(index, position)
+        if ms > start * 1000:
+            break
+        offset = segment_offset
+    return offset
+
+
+def _records(data, offset):
+    """
+    Yields (kind, fields, end offset) for every complete record
+    from offset on, and stops at a torn last record.
+    """
+    try:
+        while offset < len(data):
+            start = offset
+            kind = data[offset]
+            offset += 1
+
+            if kind == SEGMENT:
+                if offset + SEGMENT_TIME.size > len(data):
+                    return
+                ms, = SEGMENT_TIME.unpack_from(data, offset)
+                offset += SEGMENT_TIME.size
+                yield kind, (ms,), offset
+                continue
+
+            if kind == ENDPOINT:
+                endpoint_id, offset = _read_varint(data, offset)
+                length, offset = _read_varint(data, offset)
+                if offset + length > len(data):
+                    return
+                offset += length
+                yield kind, (endpoint_id, data[offset - length:offset]), offset
+                continue
+
+            if kind not in (FULL, DELTA):
+                raise ValueError("Corrupt tape record at offset {}".format(start))
+
+            delta_ms, offset = _read_varint(data, offset)
+            endpoint_id, offset = _read_varint(data, offset)
+            length, offset = _read_varint(data, offset)
+            if offset + length > len(data):
+                return
+            offset += length
+            yield kind, (delta_ms, endpoint_id, data[offset - length:offset]), offset
+    except IndexError:
+        # Truncated varint at the end of the file
+        return
+
+
+def _check_header(data, path):
+    header = MAGIC + bytes([VERSION])
+    if data[:len(header)] != header:
+        raise ValueError("Not a market data tape: {}".format(path))
+
+
+def read_tape(path, start=None):
+    """
+    Yields (timestamp, endpoint, body) for every record, from the
+    segment containing start if given. A torn last record is
+    ignored.
+    """
+    data = Path(path).read_bytes()
+    _check_header(data, path)
+
+    offset = len(MAGIC) + 1
+    if start is not None:
+        offset = _segment_offset(path, start) or offset
+
+    ms = 0
+    endpoints = {}
+    previous = {}
+
+    for kind, fields, _ in _records(data, offset):
+        if kind == SEGMENT:
+            ms, = fields
+            endpoints = {}
+            previous = {}
+            continue
+
+        if kind == ENDPOINT:
+            endpoint_id, encoded = fields
+            endpoints[endpoint_id] = encoded.decode("utf-8")
+            continue
+
+        delta_ms, endpoint_id, payload = fields
+        ms += delta_ms
+
+        if kind == FULL:
+            body = payload
+            previous[endpoint_id] = _parse_object(body)
+        else:
+            changed, removed = json.loads(payload)
+            current = dict(previous[endpoint_id])
+            current.update(changed)
+            for key in removed:
+                current.pop(key, None)
+            previous[endpoint_id] = current
+            body = _dump(current)
+
+        yield ms / 1000.0, endpoints[endpoint_id], body
+
+
+class TapeResponse:
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class Replayer:
+    """
+    Serves recorded GET responses as of a simulated clock, and
+    sends POSTs (balance, orders, transactions) to a paper
+    exchange such as mock_exchange.MockExchange.
+    """
+
+    def __init__(self, path, exchange, start=None):
+        self.exchange = exchange
+        self.times = {}
+        self.bodies = {}
+
+        for timestamp, endpoint, body in read_tape(path, start):
+            if start is not None and timestamp < start:
+                continue
+            self.times.setdefault(endpoint, []).append(timestamp)
+            self.bodies.setdefault(endpoint, []).append(body)
+
+        all_times = [times[0] for times in self.times.values()]
+        if not all_times:
+            raise ValueError("Tape has no records: {}".format(path))
+
+        self.start = min(all_times)
+        self.end = max(times[-1] for times in self.times.values())
+        self.clock = self.start
+
+    def advance(self, seconds):
+        self.clock += seconds
+
+    def get(self, endpoint):
+        times = self.times.get(endpoint)
+        if not times:
+            return TapeResponse(404, b"{}")
+
+        index = bisect_right(times, self.clock) - 1
+        if index < 0:
+            return TapeResponse(404, b"{}")
+        return TapeResponse(200, self.bodies[endpoint][index])
+
+    def post(self, endpoint, data=None):
+        data = data or {}
+
+        if endpoint == "/balance/":
+            return TapeResponse(200, _dump(self.exchange.balance()))
+        if endpoint == "/user_transactions/":
+            return TapeResponse(200, _dump(self.exchange.user_transactions(data)))
+        if endpoint.startswith("/buy/") or endpoint.startswith("/sell/"):
+            side = "buy" if endpoint.startswith("/buy/") else "sell"
+            status, payload = self.exchange.order(side, data)
+            return TapeResponse(status, _dump(payload))
+
+        return TapeResponse(404, b"{}")
@@ -0,0 +1,90 @@
+import math
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import indicators
+
+
+def random_walk(count=2000, seed=7):
+    rng = random.Random(seed)
+    price = 60000.0
+    prices = []
+    for _ in range(count):
+        price *= math.exp(rng.gauss(0.0, 0.004))
+        prices.append(price)
+    return prices
+
+
+def stream(indicator, prices, *args):
+    values = []
+    for index, price in enumerate(prices):
+        extra = [series[index] for series in args]
+        values.append(indicator.update(price, *extra))
+    return values
+
+
+def assert_matches(streamed, series):
+    assert len(streamed) == len(series)
+    for value, expected in zip(streamed, series):
+        if value is None:
+            assert math.isnan(expected)
+        else:
+            assert value == pytest.approx(expected, rel=1e-9, abs=1e-9)
+
+
+def test_ema_matches_series():
+    prices = random_walk()
+    for period in (8, 32):
+        assert_matches(
+            stream(indicators.EMA(period), prices),
+            indicators.ema_series(prices, period)
+        )
+
+
+def test_rsi_matches_series():
+    prices = random_walk()
+    assert_matches(
+        stream(indicators.RSI(14), prices),
+        indicators.rsi_series(prices, 14)
+    )
+
+
+def test_bollinger_matches_series():
+    prices = random_walk()
+    streamed = stream(indicators.Bollinger(20, 2.0), prices)
+    series = indicators.bollinger_series(prices, 20, 2.0)
+
+    for band in range(3):
+        assert_matches(
+            [None if value is None else value[band] for value in streamed],
+            series[band]
+        )
+
+
+def test_atr_matches_series():
+    prices = random_walk()
+    rng = random.Random(3)
+    highs = [price * (1.0 + rng.random() * 0.003) for price in prices]
+    lows = [price * (1.0 - rng.random() * 0.003) for price in prices]
+
+    assert_matches(
+        stream(indicators.ATR(14), prices, highs, lows),
+        indicators.atr_series(prices, 14, highs, lows)
+    )
+
+
+def test_macd_matches_series():
+    prices = random_walk()
+    streamed = stream(indicators.MACD(12, 26, 9), prices)
+    series = indicators.macd_series(prices, 12, 26, 9)
+
+    # The streaming MACD reports nothing until its signal line is
+    # seeded, so compare from there on.
+    for part in range(3):
+        values = [None if value is None else value[part] for value in streamed]
+        first = next(i for i, value in enumerate(values) if value is not None)
+        assert all(math.isnan(value) for value in series[2][:first])
+        assert_matches(values[first:], series[part][first:])
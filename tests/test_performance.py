@@ -0,0 +1,94 @@
+import csv
+import math
+import random
+
+from performance import PerformanceTracker
+
+COLUMNS = [
+    "timestamp", "btc_price", "portfolio_value_usd", "usd_balance",
+    "btc_balance", "btc_exposure", "fast_ma", "slow_ma", "long_ma",
+    "raw_signal", "confirmation_count", "decision", "reason"
+]
+
+
+def history_rows(count, seed=5):
+    rng = random.Random(seed)
+    price = 60000.0
+    usd = 1000.0
+    btc = 0.0
+    rows = []
+
+    for index in range(count):
+        price *= math.exp(rng.gauss(0.0, 0.004))
+        value = usd + btc * price
+        rows.append([
+            "2026-01-{:02d} {:02d}:{:02d}:00".format(
+                1 + index // 96, index % 96 // 4, index % 4 * 15
+            ),
+            "{:.2f}".format(price),
+            "{:.2f}".format(value),
+            "{:.2f}".format(usd),
+            "{:.8f}".format(btc),
+            "{:.6f}".format(btc * price / value),
+            "", "", "", "HOLD", 0, "HOLD", ""
+        ])
+
+        # Trade now and then; the new balance shows in the next row.
+        if index % 40 == 10 and usd > 10:
+            btc += usd * 0.5 / price
+            usd *= 0.5
+        elif index % 40 == 30 and btc > 0:
+            usd += btc * 0.5 * price
+            btc *= 0.5
+
+    return rows
+
+
+def write_rows(path, rows, header=False):
+    with open(path, "a", newline="") as history:
+        writer = csv.writer(history)
+        if header:
+            writer.writerow(COLUMNS)
+        writer.writerows(rows)
+
+
+def test_incremental_report_matches_full_read(tmp_path):
+    path = tmp_path / "trading_history.csv"
+    rows = history_rows(400)
+
+    write_rows(path, rows[:250], header=True)
+    tracker = PerformanceTracker(path, 900)
+    first = tracker.report()
+    assert first["rows"] == 250
+
+    write_rows(path, rows[250:])
+    incremental = tracker.report()
+
+    assert incremental["rows"] == 400
+    assert incremental == PerformanceTracker(path, 900).report()
+
+
+def test_unchanged_file_returns_cached_report(tmp_path):
+    path = tmp_path / "trading_history.csv"
+    write_rows(path, history_rows(50), header=True)
+
+    tracker = PerformanceTracker(path, 900)
+    assert tracker.report() is tracker.report()
+
+
+def test_fills_use_decision_row_price(tmp_path):
+    path = tmp_path / "trading_history.csv"
+    write_rows(path, [
+        ["2026-01-01 00:00:00", "100.00", "100.00", "100.00", "0.00000000",
+         "0.000000", "", "", "", "BUY", 3, "BUY", ""],
+        ["2026-01-01 00:15:00", "110.00", "110.00", "0.00", "1.00000000",
+         "1.000000", "", "", "", "SELL", 3, "SELL", ""],
+        ["2026-01-01 00:30:00", "120.00", "110.00", "110.00", "0.00000000",
+         "0.000000", "", "", "", "HOLD", 0, "HOLD", ""]
+    ], header=True)
+
+    report = PerformanceTracker(path, 900).report()
+
+    # Bought at 100 on the first row, sold at 110 on the second.
+    assert report["realized_pnl_usd"] == 110.0 - 100.0
+    assert report["trades"]["average_size_usd"] == (100.0 + 110.0) / 2
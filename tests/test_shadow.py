@@ -0,0 +1,53 @@
+import math
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from robustness import DEFAULT_PARAMS, simulate
+from shadow import ShadowBook
+
+GRID = {
+    "fast_window": [6, 8, 12],
+    "buy_buffer": [0.003, 0.005, 0.0075],
+    "sell_buffer": [0.005, 0.007, 0.01],
+    "confirmation_cycles": [2, 3]
+}
+
+
+def random_walk(count=600, seed=11):
+    rng = random.Random(seed)
+    price = 60000.0
+    prices = []
+    for _ in range(count):
+        price *= math.exp(rng.gauss(0.0, 0.006))
+        prices.append(price)
+    return prices
+
+
+def test_every_variant_matches_simulate():
+    prices = random_walk()
+    params = dict(DEFAULT_PARAMS)
+
+    book = ShadowBook(GRID)
+
+    for index in range(len(prices)):
+        book.update(
+            prices[:index + 1],
+            params["start_usd"],
+            0.0,
+            index * params["sample_seconds"]
+        )
+
+    assert len(book.variants) == 54
+    assert book.trades.sum() > 0
+
+    for index, variant in enumerate(book.variants):
+        expected = simulate(prices, dict(params, **variant))
+        equity = float(book.equity[index])
+
+        assert int(book.trades[index]) == expected["trades"]
+        assert equity / book.start_value - 1.0 == pytest.approx(
+            expected["return"], rel=1e-9, abs=1e-12
+        )
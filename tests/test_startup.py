@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Imports the bot in a fresh interpreter, the way a cold start does.
+COLD_IMPORT = """
+import json, sys, time
+started = time.perf_counter()
+import main_btc_raspberry
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "budget": main_btc_raspberry.STARTUP_BUDGET_SECONDS,
+    "loaded": sorted(
+        name for name in ("requests", "flask", "numpy", "sklearn")
+        if name in sys.modules
+    )
+}))
+"""
+
+
+def cold_import():
+    env = dict(
+        os.environ,
+        BITSTAMP_API_KEY="test",
+        BITSTAMP_API_SECRET="test",
+        BITSTAMP_CUSTOMER_ID="test",
+        PYTHONDONTWRITEBYTECODE="1"
+    )
+    env.pop("STARTUP_BUDGET_SECONDS", None)
+
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_IMPORT],
+        cwd=str(ROOT),
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_stays_within_startup_budget():
+    report = cold_import()
+    assert report["seconds"] < report["budget"]
+
+
+def test_import_defers_heavy_libraries():
+    assert cold_import()["loaded"] == []